@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+# One-off migration of history/ from the single-file layout (history/<slug>.json
+# indent=2 arrays plus a combined history/all.json) to per-ship month shards
+# (history/<slug>/<YYYY-MM>.jsonl, see save_history). Items that only survive in
+# all.json are folded back into their ship by shipSlug. Safe to re-run: shards are
+# merged by guid. The old files are removed unless --keep.
+#
+# Usage: python .github/scripts/migrate_history.py [--keep] [--dry-run]
+import os, sys, argparse
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, REPO_ROOT)
+import playwright_scrape as ps
+
+def _size(paths) -> int:
+    return sum(os.path.getsize(p) for p in paths if os.path.isfile(p))
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--keep", action="store_true", help="Leave the old .json files in place")
+    ap.add_argument("--dry-run", action="store_true", help="Report what would be written")
+    args = ap.parse_args()
+
+    legacy = sorted(fn for fn in os.listdir(ps.HIST_DIR)
+                    if fn.endswith(".json") and os.path.isfile(os.path.join(ps.HIST_DIR, fn)))
+    if not legacy:
+        print("[migrate] No single-file histories found; nothing to do.")
+        return
+
+    by_slug, orphans = {}, 0
+    # per-ship files first: their copy of an item wins over the one in all.json
+    for fn in sorted(legacy, key=lambda f: f == "all.json"):
+        items = ps.load_json(os.path.join(ps.HIST_DIR, fn), [])
+        for it in items:
+            slug = fn[:-5] if fn != "all.json" else it.get("shipSlug")
+            if not slug:
+                orphans += 1
+                continue
+            by_slug.setdefault(slug, {}).setdefault(it.get("guid", ""), it)
+
+    old_paths = [os.path.join(ps.HIST_DIR, fn) for fn in legacy]
+    for slug, items in sorted(by_slug.items()):
+        months = sorted({(it.get("eventUtc") or "")[:7] or ps.HIST_UNDATED for it in items.values()})
+        print(f"[migrate] {slug}: {len(items)} items -> {len(months)} month file(s) ({months[0]} .. {months[-1]})")
+        if not args.dry_run:
+            ps.save_history(slug, list(items.values()))
+    if orphans:
+        print(f"[migrate] Skipped {orphans} all.json item(s) without shipSlug", file=sys.stderr)
+    if args.dry_run:
+        return
+
+    new_paths = [os.path.join(ps.HIST_DIR, slug, fn) for slug in by_slug
+                 for fn in os.listdir(os.path.join(ps.HIST_DIR, slug))]
+    print(f"[migrate] {_size(old_paths) // 1024} KB in {len(old_paths)} file(s) -> "
+          f"{_size(new_paths) // 1024} KB in {len(new_paths)} file(s)")
+    if not args.keep:
+        for p in old_paths:
+            os.remove(p)
+        print(f"[migrate] Removed {', '.join(legacy)}")
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,20 @@
 #!/usr/bin/env python3
-import os, argparse, hashlib
+# Manual publishing.
+#   single: one test item written over docs/<filename> (--ship/--event/--port/--est)
+#   batch:  --batch FILE|- reads JSONL event requests, one per line:
+#             {"ship": "Disney Wish", "event": "Arrived", "port": "Nassau, Bahamas",
+#              "eventUtc": "2026-10-18T13:32:00Z" | "est": "Oct 18, 09:32 AM EDT",
+#              "link": "/ports/BSNAS001"}   (link optional)
+#           Every line is validated first (nothing is written if one fails, unless
+#           --skip-invalid). Accepted events go through the scraper's dedupe into ship
+#           history; each affected ship feed and the combined/latest feeds are written once.
+#
+# Usage: python .github/scripts/publish_latest_all.py --batch backfill.jsonl [--notify] [--dry-run]
+import os, sys, json, argparse, hashlib, re
 from datetime import datetime, timezone
 from xml.dom import minidom
 
-REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 DOCS_DIR = os.path.join(REPO_ROOT, "docs")
 
 def to_rfc1123(dt: datetime) -> str:
@@ -74,12 +85,110 @@ def build_rss(channel_title: str, channel_link: str, items: list, stylesheet: st
 """
     return pretty_xml(xml)
 
+# ---------- Batch mode ----------
+
+_TZ_ABBR_RE = re.compile(r"\s+[A-Z]{2,5}$")
+
+def _event_time(ps, req: dict):
+    """Aware UTC datetime from eventUtc (ISO 8601) or an ET label like "Oct 18, 09:32 AM EDT"."""
+    if req.get("eventUtc"):
+        dt = datetime.fromisoformat(str(req["eventUtc"]).replace("Z", "+00:00"))
+        if dt.tzinfo is None:
+            raise ValueError("eventUtc needs an offset or Z")
+        return dt.astimezone(timezone.utc)
+    if req.get("est"):
+        fields = ps._vf_time_fields(_TZ_ABBR_RE.sub("", str(req["est"]).strip()))
+        if not fields:
+            raise ValueError(f"unparseable est label {req['est']!r}")
+        return ps._infer_year(fields, ps.zinfo_eastern()).astimezone(timezone.utc)
+    raise ValueError("needs eventUtc or est")
+
+def parse_requests(ps, registry, lines):
+    """(events by slug, errors) for JSONL request lines; events are ShipEvents with source "manual"."""
+    by_name = {s["name"].lower(): s for s in registry.ships}
+    events, errors = {}, []
+    for n, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            req = json.loads(line)
+            if not isinstance(req, dict):
+                raise ValueError("not a JSON object")
+            ship = registry.by_slug.get(str(req.get("ship", ""))) or by_name.get(str(req.get("ship", "")).lower())
+            if not ship:
+                raise ValueError(f"unknown ship {req.get('ship')!r}")
+            verb = str(req.get("event", "")).capitalize()
+            if verb not in ("Arrived", "Departed"):
+                raise ValueError(f"event must be Arrived or Departed, not {req.get('event')!r}")
+            port = str(req.get("port", "")).strip()
+            if not port:
+                raise ValueError("missing port")
+            dt_utc = _event_time(ps, req).replace(second=0, microsecond=0)
+            link = req.get("link") or ""
+            if link and link != "#":
+                link = ps._abs_link("https://www.vesselfinder.com", link)
+            else:
+                link = ""
+            detail = f"{port} {'Arrival' if verb == 'Arrived' else 'Departure'} (UTC) {dt_utc.strftime('%b %d, %H:%M')}"
+            events.setdefault(ship["slug"], []).append(ps.make_event(
+                ship["slug"], ship["name"], verb, port, dt_utc, ps.port_tz_name(link, port), link, detail, "manual"))
+        except Exception as e:
+            errors.append(f"line {n}: {e}")
+    return events, errors
+
+def run_batch(args):
+    sys.path.insert(0, REPO_ROOT)
+    import playwright_scrape as ps
+
+    registry = ps.ShipRegistry.load()
+    if args.batch == "-":
+        lines = sys.stdin.read().splitlines()
+    else:
+        with open(args.batch, "r", encoding="utf-8") as f:
+            lines = f.read().splitlines()
+    events, errors = parse_requests(ps, registry, lines)
+    for err in errors:
+        print(f"[manual-publish] invalid {err}", file=sys.stderr)
+    if errors and not args.skip_invalid:
+        print(f"[manual-publish] {len(errors)} invalid request(s); nothing written (use --skip-invalid)", file=sys.stderr)
+        return 1
+
+    state = ps.load_json(ps.STATE_PATH, {})
+    canon_seen = state.setdefault("canon_seen", {})
+    combined = ps.CombinedPublisher(registry)
+    touched = 0
+    for slug, evs in events.items():
+        run = ps.ShipRun(registry.by_slug[slug])
+        evs.sort(key=lambda ev: ev.event_utc)
+        for ev in ps.dedupe(run, evs, canon_seen):
+            item = ev.to_item(datetime.utcnow())
+            run.items.append(item)
+            canon_seen[ev.guid] = True
+            if args.notify:
+                ps.post_flow_webhook(ev.payload(item))
+        print(f"[manual-publish] {run.name}: {len(evs)} requested, {len(run.items)} added, "
+              f"{len(run.updates)} updated, {len(evs) - len(run.items) - len(run.updates)} duplicate")
+        if args.dry_run or not (run.items or run.updates):
+            continue
+        combined.update(slug, ps.publish_ship(run))
+        touched += 1
+    if args.dry_run or not touched:
+        return 0
+    combined.publish()
+    ps.save_json(ps.STATE_PATH, state)
+    print(f"[manual-publish] Wrote {touched} ship feed(s) + combined/latest feeds once")
+    return 0
+
 def main():
     ap = argparse.ArgumentParser()
-    ap.add_argument("--ship", required=True)
-    ap.add_argument("--event", choices=["Arrived","Departed"], required=True)
-    ap.add_argument("--port", required=True)
-    ap.add_argument("--est", dest="est_time", required=True)
+    ap.add_argument("--batch", metavar="FILE", help="JSONL event requests to merge into history and feeds ('-' = stdin)")
+    ap.add_argument("--skip-invalid", action="store_true", help="Batch: publish the valid lines even if some fail validation")
+    ap.add_argument("--notify", action="store_true", help="Batch: send an email alert per added event")
+    ap.add_argument("--dry-run", action="store_true", help="Batch: validate and dedupe only, write nothing")
+    ap.add_argument("--ship")
+    ap.add_argument("--event", choices=["Arrived","Departed"])
+    ap.add_argument("--port")
+    ap.add_argument("--est", dest="est_time")
     ap.add_argument("--local", dest="local_time", default="")
     ap.add_argument("--link", default="#")
     ap.add_argument("--filename", default="latest-all.xml", help="Target file in docs/ (default latest-all.xml)")
@@ -87,6 +196,11 @@ def main():
     ap.add_argument("--nonce", default="", help="Uniqueness token (e.g., $GITHUB_RUN_ID) to force a new GUID")
     args = ap.parse_args()
 
+    if args.batch:
+        sys.exit(run_batch(args))
+    if not (args.ship and args.event and args.port and args.est_time):
+        ap.error("--ship, --event, --port and --est are required without --batch")
+
     os.makedirs(DOCS_DIR, exist_ok=True)
     item = build_item(args.ship, args.event, args.port, args.est_time, args.local_time, args.link, args.nonce)
     rss = build_rss("DCL Ships - Latest (One per Ship)", "https://github.com/", [item])
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+# Benchmark: CruiseMapper coordinate extraction on synthetic ship pages (see
+# bench/fixtures/cruisemapper/README.md; not captures of the live site).
+#   legacy = BeautifulSoup tree + get_text() + first COORD_RE match
+#   stream = _cm_extract_coords over 16 KB chunks (stops at the first targeted match)
+#
+# Usage: python bench/cm_coords.py [--pad-kb 300] [--runs 50]
+import os, sys, json, time, argparse
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+from bs4 import BeautifulSoup
+import playwright_scrape as ps
+
+FIX_DIR = os.path.join(REPO_ROOT, "bench", "fixtures", "cruisemapper")
+PAD_ROW = '<tr><td class="port">Nassau, Bahamas</td><td>Oct 12, 08:00</td><td>Oct 12, 17:00</td></tr>\n'
+
+def legacy(html: str):
+    return ps._parse_coords(BeautifulSoup(html, "html.parser").get_text(" ", strip=True))
+
+def stream(html: str, chunk: int = 16384):
+    scanned = [0]
+    def chunks():
+        for i in range(0, len(html), chunk):
+            scanned[0] = i + chunk
+            yield html[i:i+chunk]
+    return ps._cm_extract_coords(chunks()), min(scanned[0], len(html))
+
+def close_enough(got, want) -> bool:
+    return bool(got) and abs(got[0] - want[0]) < 1e-4 and abs(got[1] - want[1]) < 1e-4
+
+def timed(fn, html, runs):
+    t0 = time.perf_counter()
+    for _ in range(runs):
+        out = fn(html)
+    return out, (time.perf_counter() - t0) * 1000.0 / runs
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--pad-kb", type=int, default=300, help="Itinerary markup appended after the position (real pages are ~300 KB)")
+    ap.add_argument("--runs", type=int, default=50)
+    args = ap.parse_args()
+
+    with open(os.path.join(FIX_DIR, "expected.json"), "r", encoding="utf-8") as f:
+        expected = json.load(f)
+
+    pad = "<table>\n" + PAD_ROW * (args.pad_kb * 1024 // len(PAD_ROW)) + "</table>"
+    print(f"{'page':<22} {'legacy':>8} {'ms':>8} {'stream':>8} {'ms':>8} {'scanned':>10}")
+    for name, want in expected.items():
+        with open(os.path.join(FIX_DIR, name), "r", encoding="utf-8") as f:
+            html = f.read().replace("<!-- PAD -->", pad)
+        got_l, ms_l = timed(legacy, html, args.runs)
+        (got_s, scanned), ms_s = timed(stream, html, args.runs)
+        print(f"{name:<22} {'ok' if close_enough(got_l, want) else 'WRONG':>8} {ms_l:>8.2f} "
+              f"{'ok' if close_enough(got_s, want) else 'WRONG':>8} {ms_s:>8.3f} "
+              f"{scanned // 1024:>6} KB/{len(html) // 1024} KB")
+
+if __name__ == "__main__":
+    main()
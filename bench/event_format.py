@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# Benchmark: per-event formatting cost (title, description, feed item, alert payload).
+#   legacy = the pre-ShipEvent path: strptime reparse, two astimezone/strftime calls
+#            and inline f-strings per row
+#   record = _event_from_vf_row -> ShipEvent.to_item / payload with memoized labels
+#
+# Usage: python bench/event_format.py [--n 100000] [--distinct 2000]
+import os, sys, time, argparse, random
+from datetime import datetime, timezone, timedelta
+from urllib.parse import urljoin
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+import playwright_scrape as ps
+
+PORTS = [
+    ("Nassau, Bahamas", "/ports/BSNAS001"), ("Gorda Cay, Bahamas", "/ports/BSGOC001"),
+    ("Cape Canaveral, United States (USA)", "/ports/USPCV001"), ("Cozumel, Mexico", "/ports/MXCZM001"),
+    ("Galveston, United States (USA)", "/ports/USGLS001"), ("Ketchikan, United States (USA)", "/ports/USKTN001"),
+    ("Vancouver, Canada", "/ports/CAVAN001"), ("Singapore, Singapore", "/ports/SGSIN001"),
+    ("Sydney, Australia", "/ports/AUSYD001"), ("Barcelona, Spain", "/ports/ESBCN001"),
+]
+SHIP_URL = "https://www.vesselfinder.com/vessels/details/9834739"
+
+def synthetic_rows(n: int, distinct: int):
+    """n rows drawn from `distinct` port calls: every scrape re-reads mostly the same rows."""
+    rnd = random.Random(11)
+    base = datetime.now(timezone.utc) - timedelta(days=20)
+    rows = []
+    for _ in range(distinct):
+        port, link = rnd.choice(PORTS)
+        when = (base + timedelta(minutes=rnd.randrange(0, 30 * 24 * 60, 7))).strftime("%b %d, %H:%M")
+        ev = rnd.choice(("Arrived", "Departed"))
+        label = "Arrival" if ev == "Arrived" else "Departure"
+        rows.append({"event": ev, "port": port, "when_raw": when, "link": link,
+                     "detail": f"{port} {label} (UTC) {when}"})
+    return [rows[i % distinct] for i in range(n)]
+
+def legacy(r):
+    dt_utc = None
+    for fmt in ("%b %d, %H:%M", "%b %d, %I:%M %p", "%b %d, %H:%M:%S"):
+        try:
+            dt_utc = datetime.strptime(r["when_raw"], fmt).replace(year=datetime.utcnow().year, tzinfo=timezone.utc)
+            break
+        except Exception:
+            continue
+    est_str = dt_utc.astimezone(ps.zinfo_eastern()).strftime("%b %d, %I:%M %p %Z")
+    local_str = dt_utc.astimezone(ps._port_tz_from_url(r["link"], r["port"])).strftime("%b %d, %I:%M %p %Z")
+    verb = r["event"]
+    title_verb = "Arrived at" if verb == "Arrived" else "Departed from"
+    title = f"Disney Wish {title_verb} {r['port']} at {est_str}. The local time to the port is {local_str}"
+    desc = f"{r['detail']} — ET: {est_str} | Local: {local_str}"
+    link = urljoin(SHIP_URL, r["link"])
+    guid = ps._canonical_guid("disney-wish", verb, r["port"], dt_utc.isoformat())
+    item = {"title": title, "description": desc, "link": link, "guid": guid,
+            "pubDate": ps.to_rfc2822(datetime.utcnow()), "eventUtc": dt_utc.isoformat(),
+            "shipSlug": "disney-wish", "shipName": "Disney Wish", "source": "vf_ship"}
+    payload = {"ShipName": "Disney Wish", "EventType": verb, "PortName": r["port"], "ESTLabel": est_str,
+               "LocalLabel": local_str, "Link": link, "Title": title, "GuidKey": guid,
+               "PubDate": item["pubDate"], "Description": desc}
+    return item, payload
+
+def record(r):
+    ev = ps._event_from_vf_row("disney-wish", "Disney Wish", r, SHIP_URL)
+    item = ev.to_item(datetime.utcnow())
+    return item, ev.payload(item)
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=100000)
+    ap.add_argument("--distinct", type=int, default=2000, help="Distinct port calls in the set")
+    args = ap.parse_args()
+
+    rows = synthetic_rows(args.n, args.distinct)
+    for label, fn in (("legacy", legacy), ("record", record)):
+        ps._tz_label_minute.cache_clear()
+        ps._vf_time_fields.cache_clear()
+        ps._abs_link.cache_clear()
+        t0 = time.perf_counter()
+        for r in rows:
+            fn(r)
+        dt = time.perf_counter() - t0
+        print(f"[bench] {label:<7} {dt * 1e6 / len(rows):>7.2f} µs/event  ({len(rows)} events)")
+    info = ps._tz_label_minute.cache_info()
+    print(f"[bench] label cache: {info.hits} hits / {info.misses} misses")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# Benchmark: near-duplicate checks against a ship history of growing length.
+#   scan  = compare each incoming event with every history entry (verb, port key, |dt|)
+#   index = EventIndex.nearest (bisect per verb/port)
+# Incoming events are a mix of re-reports (same call, a few minutes off, another
+# source) and genuinely new calls; both paths must flag the same ones.
+#
+# Usage: python bench/near_dup.py [--sizes 250,2500,25000] [--checks 2000]
+import os, sys, time, argparse, random
+from datetime import datetime, timezone, timedelta
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+import playwright_scrape as ps
+
+PORTS = ["Nassau, Bahamas", "Gorda Cay, Bahamas", "Cape Canaveral, United States (USA)",
+         "Cozumel, Mexico", "Galveston, United States (USA)", "Disney's Lookout Cay at Lighthouse Point"]
+
+def history(n: int):
+    base = datetime(2020, 1, 1, tzinfo=timezone.utc)
+    out = []
+    for i in range(n):
+        ev = ps.make_event("disney-wish", "Disney Wish", ("Arrived", "Departed")[i % 2], PORTS[(i // 2) % len(PORTS)],
+                           base + timedelta(hours=12 * i), "UTC", "", "x", "vf_ship")
+        out.append(ev.to_item(base))
+    return out
+
+def incoming(hist: list, n: int):
+    rnd = random.Random(3)
+    out = []
+    for _ in range(n):
+        it = rnd.choice(hist)
+        f = ps._item_event_fields(it)
+        shift = rnd.choice((rnd.randint(-40, 40), rnd.randint(300, 600)))   # re-report or a new call
+        out.append((ps.EventIndex.key(f["eventType"], f["portName"], it.get("link", "")), ps._event_key(it) + shift * 60))
+    return out
+
+def scan(entries, key, ts, tol):
+    best = None
+    for k, t in entries:
+        if k == key and abs(t - ts) <= tol and (best is None or abs(t - ts) < abs(best - ts)):
+            best = t
+    return best
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="250,2500,25000")
+    ap.add_argument("--checks", type=int, default=2000)
+    args = ap.parse_args()
+
+    tol = ps.NEAR_DUP_MINUTES * 60
+    print(f"{'history':>8} {'scan µs':>10} {'index µs':>10} {'dups':>6} {'agree':>6}")
+    for n in map(int, args.sizes.split(",")):
+        hist = history(n)
+        checks = incoming(hist, args.checks)
+        entries = [(ps.EventIndex.key(f["eventType"], f["portName"], it.get("link", "")), ps._event_key(it))
+                   for it, f in ((it, ps._item_event_fields(it)) for it in hist)]
+        idx = ps.EventIndex.from_items(hist)
+
+        runs = max(1, args.checks // max(1, n // 50))
+        t0 = time.perf_counter()
+        got_scan = [scan(entries, k, t, tol) for k, t in checks[:runs]]
+        us_scan = (time.perf_counter() - t0) * 1e6 / runs
+        t0 = time.perf_counter()
+        got_idx = [idx.nearest(k, t, tol) for k, t in checks]
+        us_idx = (time.perf_counter() - t0) * 1e6 / len(checks)
+
+        agree = all(a == (b[0] if b else None) for a, b in zip(got_scan, got_idx))
+        dups = sum(1 for b in got_idx if b)
+        print(f"{n:>8} {us_scan:>10.1f} {us_idx:>10.2f} {dups:>6} {str(agree):>6}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# Benchmark: port-page fallback for a fleet, render + parse per (port, tab).
+#   serial    = PARSE_WORKERS=0: every table is parsed on the main thread right
+#               after its render, so parse time adds to render time
+#   pipelined = PARSE_WORKERS=N: PortTableCache.prefetch renders all tabs while a
+#               process pool parses the earlier ones; rows re-joined in port order
+# Renders are simulated: recorded (synthetic) table pages returned after --render-ms.
+#
+# Usage: python bench/parse_pipeline.py [--ships 8] [--ports 3] [--rows 300] [--render-ms 400] [--workers 2]
+import os, sys, time, argparse
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, os.path.join(REPO_ROOT, "bench"))
+import playwright_scrape as ps
+from port_table import synthetic_table, SHIPS
+
+def fake_render(pages: dict, render_ms: float):
+    def render(url, pool, mobile=False, **kw):
+        time.sleep(render_ms / 1000.0)
+        return pages[ps.urlparse(url).path]
+    return render
+
+def run(ships, candidates, workers):
+    ps.PARSE_WORKERS = workers
+    cache = ps.PortTableCache(pool=None)
+    t0 = time.perf_counter()
+    try:
+        out = {n: ps._fetch_port_fallback_events(cache, n, candidates[n]) for n in ships}
+    finally:
+        ps._close_parse_pool()
+    return out, time.perf_counter() - t0
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--ships", type=int, default=8)
+    ap.add_argument("--ports", type=int, default=3, help="Distinct fallback ports per ship")
+    ap.add_argument("--rows", type=int, default=300)
+    ap.add_argument("--render-ms", type=float, default=400)
+    ap.add_argument("--workers", type=int, default=2)
+    args = ap.parse_args()
+
+    ships = SHIPS[:args.ships]
+    pages, candidates = {}, {}
+    for i, name in enumerate(ships):
+        candidates[name] = []
+        for j in range(args.ports):
+            path = f"/ports/USPCV{i:02d}{j}"
+            pages[path] = synthetic_table(args.rows)
+            candidates[name].append((path, f"Port {i}-{j}"))
+    ps._rendered_html = fake_render(pages, args.render_ms)
+
+    parse_ms = []
+    for path in list(pages)[:4]:
+        t0 = time.perf_counter()
+        ps._parse_port_table(pages[path], path, "arrivals", "Port")
+        parse_ms.append((time.perf_counter() - t0) * 1000.0)
+    print(f"[bench] {len(pages) * 2} renders @ {args.render_ms:.0f} ms, "
+          f"parse ~{sum(parse_ms) / len(parse_ms):.0f} ms/table ({args.rows} rows)")
+
+    got_serial, t_serial = run(ships, candidates, 0)
+    got_pool, t_pool = run(ships, candidates, args.workers)
+    same = all([r["_iso"] for r in got_serial[n]] == [r["_iso"] for r in got_pool[n]] for n in ships)
+    print(f"[bench] serial    {t_serial:>7.2f} s")
+    print(f"[bench] pipelined {t_pool:>7.2f} s  ({t_serial / t_pool:.2f}x, {args.workers} workers)")
+    print(f"[bench] rows identical and in order: {same}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# Benchmark: matching N ships against one VF port Arrivals table.
+#   legacy = the pre-index path: one BeautifulSoup parse per ship and a
+#            tr.get_text() substring scan of every row
+#   index  = _parse_port_table once, then PortTable.rows_for per ship
+#
+# Usage: python bench/port_table.py [--rows 200] [--ships 8] [--runs 5]
+import os, sys, time, argparse, random
+from datetime import datetime, timedelta
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+from bs4 import BeautifulSoup
+import playwright_scrape as ps
+
+PORT_URL = "/ports/USCPV?name=Port-Canaveral"
+SHIPS = ["Disney Wish", "Disney Treasure", "Disney Fantasy", "Disney Destiny", "Disney Dream",
+         "Disney Magic", "Disney Wonder", "Disney Adventure"]
+
+def synthetic_table(n_rows: int) -> str:
+    rnd = random.Random(5)
+    base = datetime.utcnow() - timedelta(days=3)
+    names = SHIPS + [f"Cargo Vessel {i}" for i in range(60)] + ["Disney Wish II"]
+    out = ["<table><tr><th>Time (LT)</th><th>Vessel</th><th>Type</th></tr>"]
+    for i in range(n_rows):
+        name = rnd.choice(names)
+        imo = 9000000 + names.index(name)
+        when = (base + timedelta(minutes=37 * i)).strftime("%b %d, %H:%M")
+        out.append(f'<tr><td>{when}</td><td><a href="/vessels/details/{imo}">{name}</a></td>'
+                   f'<td>Passenger Ship</td></tr>')
+    out.append("</table>")
+    return "\n".join(out)
+
+def legacy(html: str, ship_name: str):
+    table = BeautifulSoup(html, "html.parser").find("table")
+    tz = ps._port_tz_from_url(PORT_URL, "Port Canaveral")
+    rows = []
+    for tr in table.find_all("tr"):
+        tds = tr.find_all("td")
+        if len(tds) < 2 or ship_name.lower() not in tr.get_text(" ", strip=True).lower():
+            continue
+        lt = tds[0].get_text(strip=True).replace("(LT)", "").replace("LT", "").strip()
+        _, _, iso = ps._parse_port_time_lt(lt, tz)
+        if iso:
+            rows.append(iso)
+    return rows
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=200)
+    ap.add_argument("--ships", type=int, default=8)
+    ap.add_argument("--runs", type=int, default=5)
+    args = ap.parse_args()
+
+    html = synthetic_table(args.rows)
+    ships = SHIPS[:args.ships]
+
+    t0 = time.perf_counter()
+    for _ in range(args.runs):
+        got_legacy = {n: legacy(html, n) for n in ships}
+    ms_legacy = (time.perf_counter() - t0) * 1000.0 / args.runs
+
+    t0 = time.perf_counter()
+    for _ in range(args.runs):
+        table = ps._parse_port_table(html, PORT_URL, "arrivals", "Port Canaveral")
+        got_index = {n: [r["_iso"] for r in table.rows_for(n)] for n in ships}
+    ms_index = (time.perf_counter() - t0) * 1000.0 / args.runs
+
+    # legacy substring matching also picks up "Disney Wish II" rows for "Disney Wish"
+    leaked = len(got_legacy["Disney Wish"]) - len(got_index["Disney Wish"])
+    print(f"[bench] legacy {ms_legacy:>8.2f} ms  ({len(ships)} ships x {args.rows} rows)")
+    print(f"[bench] index  {ms_index:>8.2f} ms  ({ms_legacy / ms_index:.1f}x)")
+    print(f"[bench] 'Disney Wish' rows wrongly matched by substring: {leaked}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+# Benchmark: locating the "Recent Port Calls" container on VF ship pages.
+#   search  = the text heuristics alone (_search_root: get_text() of every h1-h4/div)
+#   learned = _find_root with a per-variant selector cache, learned from the first page
+# Pages are synthetic ship pages (nested spec/nav markup around the port-calls widget);
+# every --relayout'th page moves the widget so the learned selector misses and relearns.
+#
+# Usage: python bench/vf_root.py [--pages 40] [--filler 400] [--relayout 10]
+import os, sys, time, argparse
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+from bs4 import BeautifulSoup
+import playwright_scrape as ps
+
+FRAGMENT = os.path.join(REPO_ROOT, "bench", "fixtures", "vf_xhr", "portcalls-fragment.html")
+FILLER = ('<div class="ship-section"><div class="row"><div class="col"><div class="lbl">Gross Tonnage</div>'
+          '<div class="val">144256</div></div><div class="col"><div class="lbl">Year Built</div>'
+          '<div class="val">2022</div></div></div></div>\n')
+
+def ship_page(widget: str, filler: int, section: str) -> str:
+    return ('<html><body><div id="app"><header><nav>' + FILLER * (filler // 4) + '</nav></header>'
+            '<main class="container"><div class="column">' + FILLER * filler +
+            f'<section class="{section}"><h2>Recent Port Calls</h2>{widget}</section>'
+            '</div></main><footer>' + FILLER * (filler // 4) + '</footer></div></body></html>')
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--pages", type=int, default=40)
+    ap.add_argument("--filler", type=int, default=400, help="Spec blocks around the widget")
+    ap.add_argument("--relayout", type=int, default=10, help="Change the widget's section every N pages")
+    args = ap.parse_args()
+
+    with open(FRAGMENT, "r", encoding="utf-8") as f:
+        widget = f.read()
+    soups = [BeautifulSoup(ship_page(widget, args.filler, f"port-calls-v{i // args.relayout}"), "html.parser")
+             for i in range(args.pages)]
+
+    t0 = time.perf_counter()
+    want = [ps._search_root(s) for s in soups]
+    ms_search = (time.perf_counter() - t0) * 1000.0 / len(soups)
+
+    t0 = time.perf_counter()
+    got = [ps._find_root(s, "desktop") for s in soups]
+    ms_learned = (time.perf_counter() - t0) * 1000.0 / len(soups)
+
+    same = all(a is b for a, b in zip(want, got))
+    print(f"[bench] search  {ms_search:>8.2f} ms/page  ({len(soups)} pages)")
+    print(f"[bench] learned {ms_learned:>8.2f} ms/page  ({ms_search / ms_learned:.1f}x), same container: {same}")
+    ps._root_report()
+
+if __name__ == "__main__":
+    main()
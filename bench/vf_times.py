@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# Benchmark + fixture check for VF timestamp parsing.
+#   legacy = up to three datetime.strptime attempts per label, year = current UTC year
+#   cached = VF_TIME_RE + memoized fields + year nearest to the scrape time
+#
+# Usage: python bench/vf_times.py [--n 200000]
+import os, sys, json, glob, time, argparse, random
+from datetime import datetime, timezone
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+import playwright_scrape as ps
+
+FIXTURES = os.path.join(REPO_ROOT, "bench", "fixtures", "vf_times.json")
+
+def legacy(raw_time: str):
+    raw = raw_time.strip()
+    for fmt in ("%b %d, %H:%M", "%b %d, %I:%M %p", "%b %d, %H:%M:%S"):
+        try:
+            return datetime.strptime(raw, fmt).replace(year=datetime.utcnow().year, tzinfo=timezone.utc)
+        except Exception:
+            continue
+    return None
+
+def check_fixtures() -> int:
+    with open(FIXTURES, "r", encoding="utf-8") as f:
+        cases = json.load(f)
+    bad = 0
+    for c in cases:
+        now = datetime.fromisoformat(c["now"])
+        tz = ps.zinfo(c["tz"]) if c["tz"] != "UTC" else timezone.utc
+        iso = ps._parse_port_time_lt(c["raw"], tz, now=now)[2]
+        if iso != c["expected"]:
+            bad += 1
+            print(f"[fail] {c['raw']!r} @ {c['now']} ({c['tz']}): got {iso}, want {c['expected']}")
+    print(f"[fixtures] {len(cases) - bad}/{len(cases)} year-rollover cases ok")
+    return bad
+
+def corpus(n: int):
+    raws = []
+    for path in glob.glob(os.path.join(REPO_ROOT, "history", "*.json")):
+        for it in ps.load_json(path, []):
+            d = it.get("description", "")
+            if "(UTC) " in d:
+                raws.append(d.split("(UTC) ", 1)[1].split(" — ", 1)[0])
+    raws = raws or ["Dec 30, 22:59", "Aug 22, 01:18 PM"]
+    rnd = random.Random(7)
+    return [rnd.choice(raws) for _ in range(n)], len(set(raws))
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=200000)
+    args = ap.parse_args()
+
+    bad = check_fixtures()
+    raws, distinct = corpus(args.n)
+    now = datetime.now(timezone.utc)
+    for label, fn in (("legacy", legacy), ("cached", lambda r: ps._parse_vf_time_utc(r, now=now))):
+        ps._vf_time_fields.cache_clear()
+        t0 = time.perf_counter()
+        for r in raws:
+            fn(r)
+        dt = time.perf_counter() - t0
+        print(f"[bench] {label:<7} {len(raws) / dt:>12,.0f} labels/s  ({len(raws)} labels, {distinct} distinct)")
+    sys.exit(1 if bad else 0)
+
+if __name__ == "__main__":
+    main()
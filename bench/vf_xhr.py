@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+# Offline check + timing of the XHR capture parsers on saved response bodies.
+#   Each fixture in bench/fixtures/vf_xhr is parsed with _vf_rows_from_body and the
+#   rows compared with expected.json (a body without port calls must yield []).
+#   Record real bodies with VF_CAPTURE_DIR=bench/fixtures/vf_xhr during a scrape.
+#
+# Usage: python bench/vf_xhr.py [--runs 2000]
+import os, sys, json, time, argparse
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+import playwright_scrape as ps
+
+FIX_DIR = os.path.join(REPO_ROOT, "bench", "fixtures", "vf_xhr")
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--runs", type=int, default=2000)
+    args = ap.parse_args()
+
+    with open(os.path.join(FIX_DIR, "expected.json"), "r", encoding="utf-8") as f:
+        expected = json.load(f)
+
+    print(f"{'fixture':<28} {'rows':>5} {'result':>7} {'µs/body':>9}")
+    for name, want in expected.items():
+        with open(os.path.join(FIX_DIR, name), "r", encoding="utf-8") as f:
+            body = f.read()
+        kind = "json" if name.endswith(".json") else "html"
+        t0 = time.perf_counter()
+        for _ in range(args.runs):
+            rows = ps._vf_rows_from_body(body, kind)
+        us = (time.perf_counter() - t0) * 1e6 / args.runs
+        got = [[r["event"], r["port"], r["when_raw"], r["link"]] for r in rows]
+        print(f"{name:<28} {len(got):>5} {'ok' if got == want else 'WRONG':>7} {us:>9.1f}")
+
+if __name__ == "__main__":
+    main()
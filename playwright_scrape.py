@@ -5,11 +5,21 @@
 # - PLUS port-page fallback when ship pages are stale (tries last port from ship page
 #   and any optional 'home_ports' links from ships.json; checks both Arrivals/Departures tabs)
 #
+# Usage:
+#   python playwright_scrape.py                     # every vessel, then the combined feeds
+#   python playwright_scrape.py --shard 2/4         # one worker's slice (also: --fleet dcl)
+#   python playwright_scrape.py --merge             # after the workers: combined/fleet/index feeds
+#
 # Requirements:
-#   pip install playwright beautifulsoup4
+#   pip install playwright beautifulsoup4 [brotli]
 #   python -m playwright install --with-deps chromium
 
-import os, json, hashlib, sys, math, traceback, re, time, random
+import os, json, hashlib, sys, math, traceback, re, time
+import struct, mmap, bisect, gzip, heapq, argparse, threading, multiprocessing
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor, Future
+from concurrent.futures.process import BrokenProcessPool
+from array import array
 from datetime import datetime, timezone, timedelta
 try:
     from zoneinfo import ZoneInfo
@@ -18,176 +28,66 @@ except Exception:
 from urllib.parse import urljoin, urlparse, urlunparse, parse_qs, urlencode
 from playwright.sync_api import sync_playwright, TimeoutError as PWTimeout
 from bs4 import BeautifulSoup, Tag, NavigableString
-import urllib.request
+import http.client, zlib, codecs
 import smtplib, ssl
 from email.message import EmailMessage
+from email.utils import parsedate_to_datetime
 from functools import lru_cache
+from typing import NamedTuple
+try:
+    import brotli   # optional: .br siblings are skipped without it
+except Exception:
+    brotli = None
 
 REPO_ROOT  = os.path.dirname(__file__)
 DOCS_DIR   = os.path.join(REPO_ROOT, "docs")
 STATE_PATH = os.path.join(REPO_ROOT, "state.json")
 SHIPS_PATH = os.path.join(REPO_ROOT, "ships.json")
 
-# ---- History settings ----
+# ---- History settings. Each ship's items live in history/<slug>/<YYYY-MM>.jsonl (one
+# compact item per line, oldest first; items without eventUtc in undated.jsonl). A
+# month file is rewritten only when its items change, so closed months stay as they
+# are; combined feeds are derived from the ship histories, never stored.
 HIST_DIR      = os.path.join(REPO_ROOT, "history")
+HIST_UNDATED  = "undated"
 PER_SHIP_CAP  = 250
 ALL_CAP       = 500
 
-# ---- Special geofences (center lat/lon + radius_km)
-SPECIAL_GEOFENCES = {
-    "Disney's Castaway Cay": {
-        "aliases": ["gorda cay", "castaway cay"],
-        "center": (26.0817, -77.5460),
-        "radius_km": 4.0
-    },
-    "Disney's Lookout Cay at Lighthouse Point": {
-        "aliases": ["lighthouse point", "lookout cay", "lighthouse pt"],
-        "center": (24.8350, -76.2800),
-        "radius_km": 5.0
-    },
-    # CT8/CT10 and approach
-    "Port Canaveral, Florida": {
-        "aliases": ["port canaveral", "cape canaveral", "canaveral"],
-        "center": (28.4105, -80.6190),
-        "radius_km": 6.0
-    }
-}
-
-# ---- Port timezone mapping (substring match, case-insensitive) - fallback
-PORT_TZ_MAP = [
-    ("canaveral", "America/New_York"),
-    ("everglades", "America/New_York"),
-    ("fort lauderdale", "America/New_York"),
-    ("castaway", "America/Nassau"),
-    ("gorda cay", "America/Nassau"),
-    ("lookout cay", "America/Nassau"),
-    ("lighthouse point", "America/Nassau"),
-    ("nassau", "America/Nassau"),
-    ("cozumel", "America/Cancun"),
-    ("progreso", "America/Merida"),
-    ("galveston", "America/Chicago"),
-    ("san juan", "America/Puerto_Rico"),
-    ("tortola", "America/Tortola"),
-    ("st. maarten", "America/Lower_Princes"),
-    ("st maarten", "America/Lower_Princes"),
-    ("basseterre", "America/St_Kitts"),
-    ("antigua", "America/Antigua"),
-    ("falmouth", "America/Jamaica"),
-    ("castries", "America/St_Lucia"),
-    ("st. lucia", "America/St_Lucia"),
-    ("curaçao", "America/Curacao"),
-    ("willemstad", "America/Curacao"),
-    ("aruba", "America/Aruba"),
-    ("cayman", "America/Cayman"),
-    ("roseau", "America/Dominica"),
-    ("dominica", "America/Dominica"),
-    ("cabo", "America/Mazatlan"),
-    ("ensenada", "America/Tijuana"),
-    ("vallarta", "America/Bahia_Banderas"),
-    ("juneau", "America/Juneau"),
-    ("skagway", "America/Juneau"),
-    ("ketchikan", "America/Sitka"),
-    ("icy strait", "America/Juneau"),
-    ("glacier viewing", "America/Juneau"),
-    ("honolulu", "Pacific/Honolulu"),
-    ("kahului", "Pacific/Honolulu"),
-    ("nawiliwili", "Pacific/Honolulu"),
-    ("hilo", "Pacific/Honolulu"),
-    ("auckland", "Pacific/Auckland"),
-    ("wellington", "Pacific/Auckland"),
-    ("tauranga", "Pacific/Auckland"),
-    ("christchurch", "Pacific/Auckland"),
-    ("lyttelton", "Pacific/Auckland"),
-    ("eden", "Australia/Sydney"),
-    ("hobart", "Australia/Hobart"),
-    ("melbourne", "Australia/Melbourne"),
-    ("sydney", "Australia/Sydney"),
-    ("noumea", "Pacific/Noumea"),
-    ("suva", "Pacific/Fiji"),
-    ("pago pago", "Pacific/Pago_Pago"),
-    ("southampton", "Europe/London"),
-    ("liverpool", "Europe/London"),
-    ("portland", "Europe/London"),
-    ("greenock", "Europe/London"),
-    ("amsterdam", "Europe/Amsterdam"),
-    ("rotterdam", "Europe/Amsterdam"),
-    ("zeebrugge", "Europe/Brussels"),
-    ("vigo", "Europe/Madrid"),
-    ("bilbao", "Europe/Madrid"),
-    ("malaga", "Europe/Madrid"),
-    ("barcelona", "Europe/Madrid"),
-    ("cadiz", "Europe/Madrid"),
-    ("cartagena", "Europe/Madrid"),
-    ("alesund", "Europe/Oslo"),
-    ("bergen", "Europe/Oslo"),
-    ("olden", "Europe/Oslo"),
-    ("haugesund", "Europe/Oslo"),
-    ("stavanger", "Europe/Oslo"),
-    ("mekjarvik", "Europe/Oslo"),
-    ("messina", "Europe/Rome"),
-    ("civitavecchia", "Europe/Rome"),
-    ("rome", "Europe/Rome"),
-    ("naples", "Europe/Rome"),
-    ("livorno", "Europe/Rome"),
-    ("ajaccio", "Europe/Paris"),
-    ("la coruna", "Europe/Madrid"),
-    ("coruna", "Europe/Madrid"),
-    ("chania", "Europe/Athens"),
-    ("corfu", "Europe/Athens"),
-    ("argostoli", "Europe/Athens"),
-    ("santorini", "Europe/Athens"),
-    ("mykonos", "Europe/Athens"),
-    ("dubrovnik", "Europe/Zagreb"),
-    ("athens", "Europe/Athens"),
-    ("piraeus", "Europe/Athens"),
-    ("valetta", "Europe/Malta"),
-    ("malta", "Europe/Malta"),
-    ("funchal", "Atlantic/Madeira"),
-    ("vancouver", "America/Vancouver"),
-    ("victoria", "America/Vancouver"),
-]
-
-# ---- VF port link country prefix → IANA tz (primary)
-TZ_BY_PORT_PREFIX = {
-    # Americas
-    "US": "America/New_York",
-    "CA": "America/Vancouver",
-    "MX": "America/Cancun",
-    "PR": "America/Puerto_Rico",
-    "JM": "America/Jamaica",
-    "BS": "America/Nassau",
-    "KY": "America/Cayman",
-    "AW": "America/Aruba",
-    "CW": "America/Curacao",
-    "VG": "America/Tortola",
-    # Europe
-    "GB": "Europe/London",
-    "IE": "Europe/Dublin",
-    "ES": "Europe/Madrid",
-    "PT": "Europe/Lisbon",
-    "FR": "Europe/Paris",
-    "IT": "Europe/Rome",
-    "MT": "Europe/Malta",
-    "GR": "Europe/Athens",
-    "HR": "Europe/Zagreb",
-    "NL": "Europe/Amsterdam",
-    "BE": "Europe/Brussels",
-    "DE": "Europe/Berlin",
-    "NO": "Europe/Oslo",
-    "DK": "Europe/Copenhagen",
-    "SE": "Europe/Stockholm",
-    "FI": "Europe/Helsinki",
-    "IS": "Atlantic/Reykjavik",
-    # Pacific / Oceania
-    "AU": "Australia/Sydney",
-    "NZ": "Pacific/Auckland",
-    "NC": "Pacific/Noumea",
-    "FJ": "Pacific/Fiji",
-    "AS": "Pacific/Pago_Pago",
-    # Latin America
-    "PA": "America/Panama",
-    "CO": "America/Bogota",
-}
+# ---- Registry + sharded runs. ships.json rows belong to DEFAULT_FLEET; more fleets
+# can be added as fleets/<fleet>.json lists. Sharded/fleet-filtered workers keep
+# their own state under SHARD_STATE_DIR; `--merge` folds it back into state.json
+# (newest worker file last) and removes the worker files, so the next worker run
+# starts from the merged state again.
+FLEETS_DIR      = os.path.join(REPO_ROOT, "fleets")
+DEFAULT_FLEET   = os.getenv("DEFAULT_FLEET", "dcl")
+SHARD_STATE_DIR = os.path.join(HIST_DIR, "shards")
+SHARD_OWNED_KEYS = ("geo", "vf_rows", "vf_latency")   # per-slug state; a worker file keeps only its own ships
+
+# ---- Per-host throttling: token bucket "host=rate_per_s:burst" (subdomains share
+# their parent's bucket) + circuit breaker that skips a host after repeated
+# blocks/timeouts. Breaker state is kept in state.json across runs.
+HOST_LIMITS       = os.getenv("HOST_LIMITS", "vesselfinder.com=0.5:2,cruisemapper.com=1:3")
+HOST_DEFAULT_RATE = (1.0, 2)
+BREAKER_FAILURES  = int(os.getenv("BREAKER_FAILURES", "3"))
+BREAKER_COOLDOWN  = int(os.getenv("BREAKER_COOLDOWN_S", "900"))
+
+# ---- Position track settings (CruiseMapper fixes, one .trk file per ship). The
+# files are run state, not published data: gitignored and carried between runs in
+# the actions cache. They are only compacted once TRACK_PRUNE_SLACK over a bound.
+TRACK_DIR            = os.path.join(HIST_DIR, "tracks")
+TRACK_RETENTION_DAYS = int(os.getenv("TRACK_RETENTION_DAYS", "14"))
+TRACK_MAX_FIXES      = int(os.getenv("TRACK_MAX_FIXES", "8064"))   # ~28 days @ 5 min
+TRACK_PRUNE_SLACK    = float(os.getenv("TRACK_PRUNE_SLACK", "0.25"))
+DWELL_MAX_KN         = float(os.getenv("DWELL_MAX_KN", "1.5"))      # "stopped" threshold
+
+# ---- Port registry: ports.json lists each known port once (canonical id, display
+# name, tz, UN/LOCODEs, lowercase aliases, optional geofence center/radius_km).
+# Port strings from ship pages, port pages and geofences all resolve through it.
+PORTS_PATH = os.path.join(REPO_ROOT, "ports.json")
+
+# ---- VF port link UN/LOCODE → IANA tz (primary). "ports" is keyed by the full
+# 5-char code; "countries" only lists countries that span a single zone.
+LOCODE_TZ_PATH = os.path.join(REPO_ROOT, "locode_tz.json")
 
 # ---- Default port pages to try when ship rows + home_ports are empty
 DEFAULT_PORTS_BY_SHIP = {
@@ -212,9 +112,6 @@ GLOBAL_FALLBACK_PORTS = [
 
 # ---------- Utilities ----------
 
-def _sleep_jitter(min_s=0.6, max_s=1.2):
-    time.sleep(random.uniform(min_s, max_s))
-
 def _looks_blocked(html: str) -> bool:
     if not html: return True
     low = html.lower()
@@ -265,25 +162,122 @@ def _write_if_changed(path: str, text: str) -> bool:
         print(f"[error] write failed for {path}: {e}", file=sys.stderr)
         return False
 
-def load_history(slug: str):
-    os.makedirs(HIST_DIR, exist_ok=True)
-    path = os.path.join(HIST_DIR, f"{slug}.json")
+_BUILD_DATE_RE = re.compile(r"<lastBuildDate>[^<]*</lastBuildDate>")
+
+def _write_compressed(path: str, data: bytes):
+    if not FEED_PRECOMPRESS:
+        return
     try:
-        if os.path.exists(path):
-            with open(path, "r", encoding="utf-8") as f:
-                return json.load(f)
+        with open(path + ".gz", "wb") as f:
+            f.write(gzip.compress(data, compresslevel=9, mtime=0))   # mtime=0: byte-stable output
+        if brotli is not None:
+            with open(path + ".br", "wb") as f:
+                f.write(brotli.compress(data, quality=11))
     except Exception as e:
-        print(f"[warn] Failed to read history {path}: {e}", file=sys.stderr)
-    return []
+        print(f"[warn] precompress failed for {path}: {e}", file=sys.stderr)
 
-def save_history(slug: str, items: list):
-    os.makedirs(HIST_DIR, exist_ok=True)
-    path = os.path.join(HIST_DIR, f"{slug}.json")
+def _sibling_matches(path: str, decompress, data: bytes) -> bool:
     try:
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump(items, f, indent=2, ensure_ascii=False)
+        with open(path, "rb") as f:
+            return decompress(f.read()) == data
+    except Exception:   # missing, truncated or not compressed
+        return False
+
+def _refresh_compressed(path: str):
+    """Rebuild the .gz/.br siblings of an unchanged feed if either is missing or stale."""
+    if not FEED_PRECOMPRESS:
+        return
+    try:
+        with open(path, "rb") as rf:
+            data = rf.read()
+    except OSError:
+        return
+    if (_sibling_matches(path + ".gz", gzip.decompress, data)
+            and (brotli is None or _sibling_matches(path + ".br", brotli.decompress, data))):
+        return
+    _write_compressed(path, data)
+
+def _write_feed(path: str, text: str) -> bool:
+    """
+    Write a feed document unless only its <lastBuildDate> differs, then refresh
+    the precompressed siblings. Returns True if the feed was written.
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as rf:
+            same = _BUILD_DATE_RE.sub("", rf.read()) == _BUILD_DATE_RE.sub("", text)
+    except OSError:
+        same = False
+    if same or not _write_if_changed(path, text):
+        _refresh_compressed(path)
+        return False
+    _write_compressed(path, text.encode("utf-8"))
+    return True
+
+def _read_jsonl(path: str) -> list:
+    items = []
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    items.append(json.loads(line))
+    except FileNotFoundError:
+        pass
     except Exception as e:
-        print(f"[error] Failed to write history {path}: {e}", file=sys.stderr)
+        print(f"[warn] Failed to read history {path}: {e}", file=sys.stderr)
+    return items
+
+def _history_months(slug: str) -> list:
+    """Month shards of a ship's history, newest first."""
+    try:
+        names = os.listdir(os.path.join(HIST_DIR, slug))
+    except FileNotFoundError:
+        return []
+    return sorted((n[:-6] for n in names if n.endswith(".jsonl") and n[:-6] != HIST_UNDATED), reverse=True)
+
+def load_history(slug: str, cap: int = PER_SHIP_CAP):
+    """Newest `cap` items (newest first), reading month shards only until cap is reached."""
+    d = os.path.join(HIST_DIR, slug)
+    if not os.path.isdir(d):
+        # not migrated yet (.github/scripts/migrate_history.py): the old single-file layout
+        return load_json(os.path.join(HIST_DIR, f"{slug}.json"), [])[:cap]
+    items = []
+    for month in _history_months(slug):
+        items.extend(sorted(_read_jsonl(os.path.join(d, f"{month}.jsonl")), key=_event_key, reverse=True))
+        if len(items) >= cap:
+            break
+    items.extend(_read_jsonl(os.path.join(d, f"{HIST_UNDATED}.jsonl")))
+    return items[:cap]
+
+def _history_month(it: dict) -> str:
+    return (it.get("eventUtc") or "")[:7] or HIST_UNDATED
+
+def save_history(slug: str, items: list, replaced: list = ()):
+    """
+    Fold items (new or edited, matched by guid) into their month shards; unchanged
+    shards are not rewritten. `replaced` holds the previous versions of edited
+    items: when an edit moves a guid to another month, it is dropped from the old shard.
+    """
+    by_month, moved = {}, {}
+    for it in items:
+        by_month.setdefault(_history_month(it), []).append(it)
+    new_month = {it.get("guid", ""): _history_month(it) for it in items}
+    for it in replaced:
+        guid, month = it.get("guid", ""), _history_month(it)
+        if guid in new_month and new_month[guid] != month:
+            moved.setdefault(month, set()).add(guid)
+    for month in sorted(set(by_month) | set(moved)):
+        path = os.path.join(HIST_DIR, slug, f"{month}.jsonl")
+        merged = {it.get("guid", ""): it for it in _read_jsonl(path)}
+        for guid in moved.get(month, ()):
+            merged.pop(guid, None)
+        merged.update((it.get("guid", ""), it) for it in by_month.get(month, ()))
+        if not merged:
+            if os.path.exists(path):
+                os.remove(path)
+            continue
+        rows = sorted(merged.values(), key=_event_key)
+        _write_if_changed(path, "".join(json.dumps(it, ensure_ascii=False, separators=(",", ":")) + "\n"
+                                        for it in rows))
 
 def _event_key(it):
     try:
@@ -310,11 +304,6 @@ def make_id(s: str) -> str:
     return hashlib.sha1((s or "").encode("utf-8")).hexdigest()
 
 # ---- TBA filtering ----
-SKIP_TBA = {
-    "Arrived": True,
-    "Departed": True
-}
-
 def _is_tba(item: dict) -> bool:
     """True if the item has no concrete eventUtc."""
     return not bool(item.get("eventUtc"))
@@ -323,8 +312,16 @@ def _is_tba(item: dict) -> bool:
 
 @lru_cache(maxsize=512)
 def _normalize_port_name(name: str) -> str:
-    s = (name or "").lower()
-    s = re.sub(r"[^a-z0-9]+", " ", s).strip()
+    return re.sub(r"[^a-z0-9]+", " ", (name or "").lower()).strip()
+
+@lru_cache(maxsize=512)
+def _guid_port_name(name: str) -> str:
+    """
+    Port part of the canonical guid. Frozen to the pre-registry normalization so
+    guids stay stable against canon_seen and history; cross-source port identity
+    is _port_key's job (near-dup index), not the guid's.
+    """
+    s = _normalize_port_name(name)
     s = s.replace("cape canaveral", "port canaveral")
     s = s.replace("ft lauderdale", "fort lauderdale")
     return re.sub(r"\s+", " ", s)
@@ -336,14 +333,41 @@ def _canonical_guid(slug: str, verb: str, port: str, event_iso: str) -> str:
     except Exception:
         dt = datetime.utcnow().replace(tzinfo=timezone.utc)
     dt = dt.astimezone(timezone.utc).replace(second=0, microsecond=0)
-    key = f"canon|{slug}|{verb.lower()}|{_normalize_port_name(port)}|{dt.isoformat()}"
+    key = f"canon|{slug}|{verb.lower()}|{_guid_port_name(port)}|{dt.isoformat()}"
     return make_id(key)
 
+# ---- Near-duplicates: the same verb at the same port within NEAR_DUP_MINUTES is one
+# call whichever source reported it; the entry from the more authoritative source wins.
+NEAR_DUP_MINUTES = int(os.getenv("NEAR_DUP_MINUTES", "120"))
+SOURCE_AUTHORITY = {"manual": 4, "vf_ship": 3, "vf_port": 2, "geo": 1}   # manual: publish_latest_all.py --batch
+
+@lru_cache(maxsize=2048)
+def _port_key(name: str, link: str = "") -> str:
+    """Port identity across sources: registry id (by LOCODE, then name), else the name's first comma part."""
+    port = port_registry().resolve(link, name)
+    return port.id if port else _normalize_port_name((name or "").split(",")[0])
+
 # ---- XML formatting knobs ----
 PRETTY_XML = os.getenv("PRETTY_XML", "1") == "1"
 USE_CDATA  = True
 STYLESHEET_NAME = "rss-dcl.xsl"   # written to docs/
 
+# ---- Feed paging (RFC 5005 archived feeds): docs/<feed>.xml carries the open month
+# (at least FEED_CURRENT_ITEMS); closed months live in docs/archive/<feed>-YYYY-MM.xml,
+# built from the full history shards and rebuilt only when a late event lands in them
+FEED_CURRENT_ITEMS = int(os.getenv("FEED_CURRENT_ITEMS", "100"))
+ARCHIVE_DIR        = os.path.join(DOCS_DIR, "archive")
+ATOM_NS            = "http://www.w3.org/2005/Atom"
+FH_NS              = "http://purl.org/syndication/history/1.0"
+
+# ---- Feed artifacts: <feed>.json snapshots + .gz/.br siblings of every written feed
+# (FEED_PRECOMPRESS=0 to skip the compressed copies)
+FEED_PRECOMPRESS = os.getenv("FEED_PRECOMPRESS", "1") == "1"
+
+# ---- Landing page data: docs/index.json + lazily loaded docs/recent/<slug>.json shards
+RECENT_DIR         = os.path.join(DOCS_DIR, "recent")
+RECENT_SHARD_ITEMS = int(os.getenv("RECENT_SHARD_ITEMS", "20"))
+
 def _pretty_xml(xml_str: str) -> str:
     if not PRETTY_XML:
         return xml_str
@@ -521,7 +545,12 @@ def post_flow_webhook(payload: dict):
     except Exception as e:
         print(f"[warn] email alert failed: {e}", file=sys.stderr)
 
-def build_rss(channel_title: str, channel_link: str, items: list, stylesheet=None, use_cdata=None) -> str:
+def build_rss(channel_title: str, channel_link: str, items: list, stylesheet=None, use_cdata=None,
+              atom_links=None, archive: bool = False) -> str:
+    """
+    RSS 2.0 document. atom_links is [(rel, href)] emitted as <atom:link>
+    (self / current / prev-archive); archive=True marks an RFC 5005 archive document.
+    """
     if stylesheet is None:
         stylesheet = STYLESHEET_NAME
     if use_cdata is None:
@@ -545,101 +574,990 @@ def build_rss(channel_title: str, channel_link: str, items: list, stylesheet=Non
     <description>{desc_xml}</description>
   </item>""")
 
+    ns = ""
+    head = ""
+    if atom_links or archive:
+        ns += f' xmlns:atom="{ATOM_NS}"'
+        head += "".join(f'\n  <atom:link rel="{rel}" href="{rss_escape(href)}"/>' for rel, href in (atom_links or []) if href)
+    if archive:
+        ns += f' xmlns:fh="{FH_NS}"'
+        head += "\n  <fh:archive/>"
+
     pi = f'\n<?xml-stylesheet type="text/xsl" href="{stylesheet}"?>' if stylesheet else ""
     xml = f"""<?xml version="1.0" encoding="UTF-8"?>{pi}
-<rss version="2.0">
+<rss version="2.0"{ns}>
 <channel>
   <title>{rss_escape(channel_title)}</title>
   <link>{rss_escape(channel_link)}</link>
   <description>{rss_escape(channel_title)} - Auto-generated</description>
-  <lastBuildDate>{to_rfc2822(datetime.utcnow())}</lastBuildDate>
+  <lastBuildDate>{to_rfc2822(datetime.utcnow())}</lastBuildDate>{head}
   {''.join(xml_items)}
 </channel>
 </rss>
 """
     return xml
 
+# ---------- Feed archives (RFC 5005) ----------
+
+@lru_cache(maxsize=1)
+def site_base_url() -> str:
+    """Public base URL of docs/: FEED_BASE_URL, else https://<docs/CNAME>/."""
+    base = os.getenv("FEED_BASE_URL", "").strip()
+    if not base:
+        try:
+            with open(os.path.join(DOCS_DIR, "CNAME"), "r", encoding="utf-8") as f:
+                base = f"https://{f.read().strip()}/"
+        except Exception:
+            base = "/"
+    return base if base.endswith("/") else base + "/"
+
+def feed_url(feed: str) -> str:
+    return f"{site_base_url()}{feed}.xml"
+
+def archive_url(feed: str, month: str) -> str:
+    return f"{site_base_url()}archive/{feed}-{month}.xml"
+
+def _archive_months(feed: str) -> list:
+    """Months (YYYY-MM) that already have an archive document for feed, ascending."""
+    rx = re.compile(rf"^{re.escape(feed)}-(\d{{4}}-\d{{2}})\.xml$")
+    try:
+        names = os.listdir(ARCHIVE_DIR)
+    except OSError:
+        return []
+    return sorted(m.group(1) for m in map(rx.match, names) if m)
+
+_ARCHIVE_GUID_RE = re.compile(r"<guid[^>]*>(.*?)</guid>")
+
+def _file_sig(path: str):
+    """(path, mtime_ns, size) for the per-run read caches below; None if missing."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return path, st.st_mtime_ns, st.st_size
+
+@lru_cache(maxsize=256)
+def _archived_guids_at(sig) -> frozenset:
+    with open(sig[0], "r", encoding="utf-8") as f:
+        return frozenset(_ARCHIVE_GUID_RE.findall(f.read()))
+
+def _archived_guids(path: str) -> frozenset:
+    """Escaped guids already in an archive document (empty if it does not exist)."""
+    sig = _file_sig(path)
+    return _archived_guids_at(sig) if sig else frozenset()
+
+@lru_cache(maxsize=1024)
+def _month_shard_at(sig) -> tuple:
+    return tuple(_read_jsonl(sig[0]))
+
+def _month_shard(slug: str, month: str) -> tuple:
+    """Every item of one ship's month shard (uncapped), cached while the file is unchanged."""
+    sig = _file_sig(os.path.join(HIST_DIR, slug, f"{month}.jsonl"))
+    return _month_shard_at(sig) if sig else ()
+
+def write_feed_archives(feed: str, title: str, channel_link: str, slugs: list, now: datetime = None):
+    """
+    Write archive documents for the closed months of the ships in `slugs`, read
+    from their full month shards (not the capped feed history), so every closed
+    month is complete. A month's archive is rebuilt only when it lacks a guid (a
+    late event) or the month before it gets its first archive (its prev-archive
+    link moves). Returns (newest archive URL, set of archived months).
+    """
+    now = now or datetime.utcnow()
+    open_month = now.strftime("%Y-%m")
+    existing = set(_archive_months(feed))
+    closed = {m for slug in slugs for m in _history_months(slug) if m < open_month}
+
+    chain = sorted(existing | closed)
+    relink = False
+    for i, month in enumerate(chain):
+        created = month not in existing
+        if month in closed:
+            path = os.path.join(ARCHIVE_DIR, f"{feed}-{month}.xml")
+            items = [it for slug in slugs for it in _month_shard(slug, month)]
+            archived = frozenset() if created else _archived_guids(path)
+            if created or relink or any(rss_escape(it.get("guid", "")) not in archived for it in items):
+                links = [("current", feed_url(feed))]
+                if i:
+                    links.append(("prev-archive", archive_url(feed, chain[i - 1])))
+                items.sort(key=_event_key, reverse=True)
+                xml = build_rss(f"{title} ({month})", channel_link, items,
+                                stylesheet=f"../{STYLESHEET_NAME}", atom_links=links, archive=True)
+                if _write_feed(path, _pretty_xml(xml)):
+                    print(f"[info] {'Archived' if created else 'Rebuilt archive'} {feed} {month}: {len(items)} items")
+        relink = created
+
+    return (archive_url(feed, chain[-1]) if chain else None), set(chain)
+
+_DESC_LABELS_RE = re.compile(r" — ET: (.*?)(?: \| Local: (.*))?$")
+
+def _item_event_fields(it: dict) -> dict:
+    """eventType/portName/estLabel/localLabel for an item; older items only carry them inside title/description."""
+    desc = it.get("description", "")
+    verb = it.get("eventType") or ("Arrived" if " Arrived at " in it.get("title", "") else "Departed")
+    port = it.get("portName")
+    if not port:
+        cut = desc.find(" Arrival (UTC)") if verb == "Arrived" else desc.find(" Departure (UTC)")
+        port = desc[:cut] if cut > 0 else ""
+    est, local = it.get("estLabel"), it.get("localLabel")
+    if est is None:
+        m = _DESC_LABELS_RE.search(desc)
+        est, local = (m.group(1), m.group(2) or "") if m else ("", "")
+    return {"eventType": verb, "portName": port, "estLabel": est or "", "localLabel": local or ""}
+
+def build_json_snapshot(title: str, feed: str, items: list) -> str:
+    """
+    Compact JSON twin of <feed>.xml: one flat object per item with the event
+    fields RSS buries in title/description as first-class keys.
+    """
+    out = []
+    for it in items:
+        entry = {"guid": it.get("guid", ""), "eventUtc": it.get("eventUtc", "")}
+        entry.update(_item_event_fields(it))
+        entry.update({
+            "shipSlug": it.get("shipSlug", ""),
+            "shipName": it.get("shipName", ""),
+            "source": it.get("source", ""),
+            "link": it.get("link", ""),
+            "pubDate": it.get("pubDate", ""),
+        })
+        out.append(entry)
+    doc = {"title": title, "feed": feed_url(feed), "count": len(out), "items": out}
+    return json.dumps(doc, ensure_ascii=False, separators=(",", ":"))
+
+def _newest_pub_date(items) -> str:
+    """Newest pubDate among items as ISO-8601 UTC ("" if none parse)."""
+    newest = None
+    for it in items:
+        try:
+            dt = parsedate_to_datetime(it.get("pubDate", ""))
+        except (TypeError, ValueError):
+            continue
+        if newest is None or dt > newest:
+            newest = dt
+    return newest.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ") if newest else ""
+
+def build_site_index(ships: list, ship_stats: dict, all_count: int, updated: str = "") -> str:
+    """
+    docs/index.json for the landing page: ships in ships.json order with their
+    feed/shard URLs (relative to docs/), history counts and latest event.
+    ship_stats maps slug -> (history_count, newest_item_or_None). `updated` is the
+    newest item pubDate (not the run time), so an idle run leaves the file as is.
+    """
+    out = []
+    for s in ships:
+        slug = s.get("slug")
+        if not slug or slug not in ship_stats:
+            continue
+        count, newest = ship_stats[slug]
+        latest = None
+        if newest:
+            latest = {"eventUtc": newest.get("eventUtc", ""), "link": newest.get("link", "")}
+            latest.update(_item_event_fields(newest))
+        out.append({
+            "slug": slug,
+            "name": s.get("name", slug),
+            "badge": s.get("badge") or "".join(w[0] for w in s.get("name", slug).split()[:2]).upper(),
+            "imo": s.get("imo", ""),
+            "rss": f"{slug}.xml",
+            "latestRss": f"{slug}-latest.xml",
+            "json": f"{slug}.json",
+            "recent": f"recent/{slug}.json",
+            "count": count,
+            "latest": latest,
+        })
+    doc = {
+        "updated": updated,
+        "all": {"rss": "all.xml", "json": "all.json", "latestRss": "latest-all.xml",
+                "latestJson": "latest-all.json", "count": all_count},
+        "ships": out,
+    }
+    return json.dumps(doc, ensure_ascii=False, separators=(",", ":"))
+
+def build_current_feed(feed: str, title: str, channel_link: str, hist: list, slugs: list, now: datetime = None):
+    """
+    (xml, items) for the current document: the open month (and undated items) of
+    hist, at least its newest FEED_CURRENT_ITEMS, linked to the monthly archives
+    of `slugs`' history shards.
+    """
+    now = now or datetime.utcnow()
+    prev, _ = write_feed_archives(feed, title, channel_link, slugs, now)
+    open_month = now.strftime("%Y-%m")
+    items = [it for i, it in enumerate(hist)
+             if i < FEED_CURRENT_ITEMS or (it.get("eventUtc") or "")[:7] >= open_month or _is_tba(it)]
+    links = [("self", feed_url(feed)), ("prev-archive", prev)]
+    return build_rss(title, channel_link, items, atom_links=links), items
+
 # ---------- Time handling ----------
 
-def _parse_vf_time_utc(raw_time: str):
-    if not raw_time:
+# VF labels: "Dec 30, 22:59", "Dec 30, 05:59 PM", "Dec 30, 22:59:10" (no year).
+VF_TIME_RE = re.compile(
+    r"^\s*([A-Za-z]{3})[a-z]*\.?\s+(\d{1,2}),?\s+(\d{1,2}):(\d{2})(?::(\d{2}))?\s*([AaPp][Mm])?\s*$"
+)
+_MONTHS = {m: i for i, m in enumerate(
+    ("jan","feb","mar","apr","may","jun","jul","aug","sep","oct","nov","dec"), start=1)}
+
+@lru_cache(maxsize=4096)
+def _vf_time_fields(raw: str):
+    """(month, day, hour, minute, second) from a VF time label, or None. Year-free, so safe to memoize."""
+    m = VF_TIME_RE.match(raw or "")
+    if not m:
+        return None
+    mon = _MONTHS.get(m.group(1).lower())
+    day, hour, minute = int(m.group(2)), int(m.group(3)), int(m.group(4))
+    second = int(m.group(5) or 0)
+    ampm = (m.group(6) or "").lower()
+    if ampm:
+        if not 1 <= hour <= 12:
+            return None
+        hour = hour % 12 + (12 if ampm == "pm" else 0)
+    if not mon or not 1 <= day <= 31 or hour > 23 or minute > 59 or second > 59:
         return None
-    raw = raw_time.strip()
-    fmts = ["%b %d, %H:%M", "%b %d, %I:%M %p", "%b %d, %H:%M:%S"]
-    for fmt in fmts:
+    return (mon, day, hour, minute, second)
+
+def _infer_year(fields, tz, now: datetime = None):
+    """
+    Aware datetime in tz for year-less fields, picking the year (previous, current
+    or next, as seen from `now`) that puts the event nearest to now. A "Dec 30" label
+    scraped on Jan 1 is last year's; a "Jan 2" label scraped on Dec 31 is next year's.
+    """
+    now = now or datetime.now(timezone.utc)
+    mon, day, hour, minute, second = fields
+    ref_year = now.astimezone(tz).year
+    best = None
+    for y in (ref_year - 1, ref_year, ref_year + 1):
         try:
-            dt = datetime.strptime(raw, fmt)
-            return dt.replace(year=datetime.utcnow().year, tzinfo=timezone.utc)
-        except Exception:
+            cand = datetime(y, mon, day, hour, minute, second, tzinfo=tz)
+        except ValueError:   # Feb 29 outside a leap year, Apr 31, ...
             continue
-    return None
+        if best is None or abs(cand - now) < abs(best - now):
+            best = cand
+    return best
 
-def _port_zoneinfo_from_link(port_link: str):
-    try:
-        m = re.search(r"/ports/([A-Z]{2})", port_link or "")
-        if not m: return None
-        cc = m.group(1)
-        tz = TZ_BY_PORT_PREFIX.get(cc)
-        return zinfo(tz) if tz else None
-    except Exception:
+def _parse_vf_time_utc(raw_time: str, now: datetime = None):
+    fields = _vf_time_fields((raw_time or "").strip())
+    if not fields:
+        return None
+    return _infer_year(fields, timezone.utc, now)
+
+class NeedleMatcher:
+    """
+    Aho–Corasick automaton over (needle, value) pairs. match() returns the value
+    of the earliest-listed needle occurring in the text as whole words (not
+    flanked by letters/digits), in one pass over the text.
+    """
+    def __init__(self, pairs):
+        self.values = [v for _, v in pairs]
+        self.lens = [len(n) for n, _ in pairs]
+        self.goto = [{}]; self.fail = [0]; self.out = [[]]
+        for idx, (needle, _) in enumerate(pairs):
+            node = 0
+            for ch in needle:
+                nxt = self.goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto.append({}); self.fail.append(0); self.out.append([])
+                    self.goto[node][ch] = nxt
+                node = nxt
+            self.out[node].append(idx)
+        queue = list(self.goto[0].values())   # depth-1 nodes keep fail = root
+        for node in queue:
+            for ch, nxt in self.goto[node].items():
+                f = self.fail[node]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(ch, 0)
+                self.out[nxt] = self.out[nxt] + self.out[self.fail[nxt]]
+                queue.append(nxt)
+
+    def match(self, text: str):
+        text = text or ""
+        best = None
+        node = 0
+        for end, ch in enumerate(text):
+            while node and ch not in self.goto[node]:
+                node = self.fail[node]
+            node = self.goto[node].get(ch, 0)
+            for idx in self.out[node]:
+                if best is not None and idx >= best:
+                    continue
+                start = end + 1 - self.lens[idx]
+                if (start == 0 or not text[start - 1].isalnum()) and (end + 1 == len(text) or not text[end + 1].isalnum()):
+                    best = idx
+        return None if best is None else self.values[best]
+
+@lru_cache(maxsize=1)
+def _locode_tz_table():
+    data = load_json(LOCODE_TZ_PATH, {})
+    return data.get("ports", {}), data.get("countries", {})
+
+PORT_LOCODE_RE = re.compile(r"/ports/([A-Z]{2}[A-Z0-9]{3})")
+
+class Port(NamedTuple):
+    id: str
+    name: str
+    tz: str
+    locodes: tuple
+    aliases: tuple
+    geofence: dict   # {"center": [lat, lon], "radius_km": r} or None
+
+class PortRegistry:
+    """
+    ports.json indexed once: UN/LOCODE and exact-name hashes, plus one NeedleMatcher
+    over every alias so any other port string resolves in a single pass over it.
+    Lookup order is LOCODE, exact name, then aliases as whole words of the
+    lowercased text (the one listed first wins).
+    """
+    def __init__(self, rows: list):
+        self.ports = [Port(r["id"], r.get("name") or r["id"], r.get("tz") or EASTERN_TZ,
+                           tuple(r.get("locodes", ())), tuple(r.get("aliases", ())), r.get("geofence"))
+                      for r in rows]
+        self.by_id = {p.id: p for p in self.ports}
+        self.by_locode = {code: p for p in self.ports for code in p.locodes}
+        self.by_name = {}
+        for p in self.ports:
+            for n in (p.name,) + p.aliases:
+                self.by_name.setdefault(_normalize_port_name(n), p)
+        self.matcher = NeedleMatcher([(a, p) for p in self.ports for a in p.aliases])
+
+    @classmethod
+    def load(cls, path: str) -> "PortRegistry":
+        return cls(load_json(path, {}).get("ports", []))
+
+    def from_link(self, link: str):
+        m = PORT_LOCODE_RE.search(link or "")
+        return self.by_locode.get(m.group(1)) if m else None
+
+    def from_name(self, name: str):
+        return self.by_name.get(_normalize_port_name(name)) or self.matcher.match((name or "").lower())
+
+    def resolve(self, link: str = "", name: str = ""):
+        """Port for a VF link and/or display name (link wins), or None when unknown."""
+        return self.from_link(link) or self.from_name(name)
+
+    def geofences(self) -> list:
+        return [p for p in self.ports if p.geofence]
+
+@lru_cache(maxsize=1)
+def port_registry() -> "PortRegistry":
+    return PortRegistry.load(PORTS_PATH)
+
+@lru_cache(maxsize=1024)
+def _port_tz_name_from_link(port_link: str):
+    """IANA tz for a VF port link via its UN/LOCODE, or None (unknown port in a multi-zone country)."""
+    m = PORT_LOCODE_RE.search(port_link or "")
+    if not m:
         return None
+    code = m.group(1)
+    ports, countries = _locode_tz_table()
+    port = port_registry().by_locode.get(code)
+    return ports.get(code) or (port.tz if port else None) or countries.get(code[:2])
+
+@lru_cache(maxsize=1024)
+def _port_tz_name_from_name(port_name: str):
+    port = port_registry().from_name(port_name or "")
+    return port.tz if port else "America/New_York"
+
+@lru_cache(maxsize=2048)
+def port_tz_name(port_link: str, port_name: str) -> str:
+    """Resolve a port to an IANA tz name: LOCODE table, then registry aliases, then Eastern."""
+    return _port_tz_name_from_link(port_link or "") or _port_tz_name_from_name(port_name or "")
+
+def _port_zoneinfo_from_link(port_link: str):
+    tz = _port_tz_name_from_link(port_link or "")
+    return zinfo(tz) if tz else None
 
 def _port_zoneinfo_from_name(port_name: str):
-    if not port_name:
-        return zinfo_eastern()
-    name = port_name.lower()
-    for needle, tz in PORT_TZ_MAP:
-        if needle in name:
-            return zinfo(tz)
-    return zinfo_eastern()
+    return zinfo(_port_tz_name_from_name(port_name or ""))
+
+EASTERN_TZ = "America/New_York"
+
+@lru_cache(maxsize=8192)
+def _tz_label_minute(utc_minute: int, tz_name: str) -> str:
+    tz = zinfo(tz_name)
+    return datetime.fromtimestamp(utc_minute * 60, tz=tz or timezone.utc).strftime("%b %d, %I:%M %p %Z")
+
+def tz_label(dt_utc: datetime, tz_name: str) -> str:
+    """'Dec 30, 05:59 PM EST'-style label; memoized per (UTC minute, zone)."""
+    return _tz_label_minute(int(dt_utc.timestamp()) // 60, tz_name)
 
 def format_times_for_notification(port_name: str, port_link: str, when_raw: str):
     dt_utc = _parse_vf_time_utc(when_raw)
     if not dt_utc:
         return None, None, None
+    tz_name = port_tz_name(port_link or "", port_name or "")
+    return tz_label(dt_utc, EASTERN_TZ), tz_label(dt_utc, tz_name), dt_utc.isoformat()
 
-    eastern = zinfo_eastern()
-    est_dt = dt_utc.astimezone(eastern) if eastern else dt_utc
-    est_str = est_dt.strftime("%b %d, %I:%M %p %Z")
+# ---------- Event records ----------
 
-    tz_local = _port_zoneinfo_from_link(port_link) or _port_zoneinfo_from_name(port_name)
-    local_dt = dt_utc.astimezone(tz_local) if tz_local else dt_utc
-    local_str = local_dt.strftime("%b %d, %I:%M %p %Z")
+class ShipEvent(NamedTuple):
+    """
+    One normalized arrival/departure with its labels and canonical guid resolved
+    once (see make_event). Feed items, titles and alert payloads all derive from
+    it, so the ship-page, port-fallback and geofence paths format identically.
+    """
+    slug: str
+    ship_name: str
+    verb: str             # Arrived | Departed
+    port: str
+    event_utc: datetime   # aware UTC
+    link: str
+    detail: str           # "<port> Arrival (UTC) Dec 30, 22:59"
+    source: str           # vf_ship | vf_port | geo | manual
+    est_label: str
+    local_label: str
+    guid: str
+
+    @property
+    def event_iso(self) -> str:
+        return self.event_utc.isoformat()
+
+    @property
+    def title(self) -> str:
+        title_verb = "Arrived at" if self.verb == "Arrived" else "Departed from"
+        return (f"{self.ship_name} {title_verb} {self.port} at {self.est_label}. "
+                f"The local time to the port is {self.local_label}")
+
+    @property
+    def description(self) -> str:
+        if self.source == "geo":
+            return f"{self.detail} — Geofence"
+        return f"{self.detail} — ET: {self.est_label} | Local: {self.local_label}"
+
+    def to_item(self, pub_dt: datetime) -> dict:
+        item = {
+            "title": self.title,
+            "description": self.description,
+            "link": self.link,
+            "guid": self.guid,
+            "pubDate": to_rfc2822(pub_dt),
+            "eventUtc": self.event_iso,
+            "shipSlug": self.slug,
+            "shipName": self.ship_name,
+            "source": self.source
+        }
+        if self.source == "geo":
+            # explicit fields for webhook convenience:
+            item.update({"eventType": self.verb, "portName": self.port,
+                         "estLabel": self.est_label, "localLabel": self.local_label})
+        return item
+
+    def payload(self, item: dict) -> dict:
+        """ShipAlert JSON for post_flow_webhook."""
+        return {
+            "ShipName":   self.ship_name,
+            "EventType":  self.verb,                 # Arrived | Departed
+            "PortName":   self.port,
+            "ESTLabel":   self.est_label,
+            "LocalLabel": self.local_label,
+            "Link":       self.link or "",
+            "Title":      item["title"],
+            "GuidKey":    item["guid"],
+            "PubDate":    item["pubDate"],
+            "Description": item["description"]
+        }
+
+def make_event(slug: str, ship_name: str, verb: str, port: str, event_utc: datetime,
+               tz_name: str, link: str, detail: str, source: str) -> ShipEvent:
+    return ShipEvent(
+        slug, ship_name, verb, port, event_utc, link, detail, source,
+        tz_label(event_utc, EASTERN_TZ), tz_label(event_utc, tz_name),
+        _canonical_guid(slug, verb, port, event_utc.isoformat())
+    )
+
+class EventIndex:
+    """
+    One ship's events by (verb, port id), each a sorted list of epochs with the
+    (guid, source) of the entry at that time. nearest() is a bisect, so a check
+    stays O(log n) however long the history grows.
+    """
+    def __init__(self):
+        self.keys = {}   # (verb, port_key) -> ([epoch, ...], [(guid, source), ...])
+
+    @staticmethod
+    def key(verb: str, port: str, link: str = "") -> tuple:
+        return verb, _port_key(port, link)
+
+    @classmethod
+    def from_items(cls, items: list) -> "EventIndex":
+        idx = cls()
+        for it in items:
+            ts = _event_key(it)
+            if ts:
+                f = _item_event_fields(it)
+                idx.add(cls.key(f["eventType"], f["portName"], it.get("link", "")), ts,
+                        it.get("guid", ""), it.get("source", ""))
+        return idx
+
+    def add(self, key: tuple, ts: float, guid: str, source: str):
+        epochs, entries = self.keys.setdefault(key, ([], []))
+        i = bisect.bisect_right(epochs, ts)
+        epochs.insert(i, ts)
+        entries.insert(i, (guid, source))
+
+    def remove(self, key: tuple, ts: float, guid: str):
+        epochs, entries = self.keys.get(key, ([], []))
+        i = bisect.bisect_left(epochs, ts)
+        while i < len(epochs) and epochs[i] == ts:
+            if entries[i][0] == guid:
+                del epochs[i], entries[i]
+                return
+            i += 1
+
+    def nearest(self, key: tuple, ts: float, tolerance_s: float):
+        """(epoch, guid, source) of the closest entry within tolerance_s, else None."""
+        epochs, entries = self.keys.get(key, ((), ()))
+        i = bisect.bisect_left(epochs, ts)
+        best = None
+        for j in (i - 1, i):
+            if 0 <= j < len(epochs) and abs(epochs[j] - ts) <= tolerance_s:
+                if best is None or abs(epochs[j] - ts) < abs(epochs[best] - ts):
+                    best = j
+        return None if best is None else (epochs[best],) + entries[best]
+
+def _updated_item(old: dict, ev: "ShipEvent") -> dict:
+    """ev's item in place of a near-duplicate entry: same guid and pubDate, so readers see an edit."""
+    item = ev.to_item(datetime.utcnow())
+    item["guid"] = old.get("guid", item["guid"])
+    item["pubDate"] = old.get("pubDate", item["pubDate"])
+    return item
+
+@lru_cache(maxsize=1024)
+def _abs_link(base: str, link: str) -> str:
+    return urljoin(base, link) if link else base
+
+def _event_from_vf_row(slug: str, ship_name: str, r: dict, page_url: str):
+    """ShipEvent for a ship-page row, or None while its time is not posted / unparseable."""
+    dt_utc = _parse_vf_time_utc(r.get("when_raw", ""))
+    if not dt_utc:
+        return None
+    verb = "Arrived" if r.get("event") == "Arrived" else "Departed"
+    port = r.get("port", "")
+    return make_event(
+        slug, ship_name, verb, port, dt_utc,
+        port_tz_name(r.get("link", ""), port),
+        _abs_link(page_url, r.get("link", "")),
+        r.get("detail", "").replace(" (UTC) -", " (UTC) (time not yet posted)"),
+        "vf_ship"
+    )
+
+def _event_from_port_row(slug: str, ship_name: str, r: dict):
+    if not r.get("_iso"):
+        return None
+    return make_event(
+        slug, ship_name, r["event"], r["port"], datetime.fromisoformat(r["_iso"]),
+        port_tz_name(r.get("link", ""), r["port"]),
+        _abs_link("https://www.vesselfinder.com", r.get("link", "")),
+        r.get("detail", ""),
+        "vf_port"
+    )
+
+# ---------- Host throttling ----------
 
-    return est_str, local_str, dt_utc.isoformat()
+class HostCooling(RuntimeError):
+    """Raised instead of contacting a host whose circuit breaker is open."""
+
+class HostGate:
+    """
+    Token bucket (rate/s refill, `burst` capacity) plus a circuit breaker for one host.
+    acquire() reserves a token and sleeps only for the deficit; after
+    BREAKER_FAILURES consecutive failures the host is skipped for BREAKER_COOLDOWN
+    seconds, then a single probe is allowed (one more failure re-opens it).
+    """
+    def __init__(self, host: str, rate: float, burst: int):
+        self.host = host
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.stamp = time.monotonic()
+        self.failures = 0
+        self.open_until = 0.0    # wall-clock epoch, so it survives between runs
+        self.waited = 0.0
+        self._lock = threading.Lock()
+
+    def is_open(self) -> bool:
+        return time.time() < self.open_until
+
+    def acquire(self):
+        if self.is_open():
+            raise HostCooling(f"{self.host} cooling down until "
+                              f"{datetime.utcfromtimestamp(self.open_until).strftime('%H:%M:%SZ')}")
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+            self.stamp = now
+            self.tokens -= 1.0
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            self.waited += wait
+        if wait:
+            time.sleep(wait)
+
+    def success(self):
+        with self._lock:
+            self.failures = 0
+
+    def failure(self, why: str):
+        with self._lock:
+            self.failures += 1
+            if self.failures < BREAKER_FAILURES:
+                return
+            self.open_until = time.time() + BREAKER_COOLDOWN
+        print(f"[warn] {self.host}: {self.failures} consecutive failures ({why}); "
+              f"pausing requests for {BREAKER_COOLDOWN}s", file=sys.stderr)
+
+class HostThrottle:
+    """HostGate per registrable host; limits come from HOST_LIMITS."""
+    def __init__(self, spec: str = HOST_LIMITS):
+        self.limits = {}
+        for part in (spec or "").split(","):
+            host, _, lim = part.strip().partition("=")
+            if not host or not lim:
+                continue
+            try:
+                rate, _, burst = lim.partition(":")
+                self.limits[host.lower()] = (float(rate), int(burst or 1))
+            except ValueError:
+                print(f"[warn] bad HOST_LIMITS entry {part!r}", file=sys.stderr)
+        self.gates = {}
+        self._lock = threading.Lock()
+
+    def _host_key(self, host: str) -> str:
+        host = (host or "").lower().split(":")[0]
+        for known in self.limits:
+            if host == known or host.endswith("." + known):
+                return known
+        return host[4:] if host.startswith("www.") else host
+
+    def gate(self, url: str) -> "HostGate":
+        key = self._host_key(urlparse(url).netloc)
+        with self._lock:
+            g = self.gates.get(key)
+            if g is None:
+                g = self.gates[key] = HostGate(key, *self.limits.get(key, HOST_DEFAULT_RATE))
+            return g
+
+    def load(self, saved: dict):
+        for host, rec in (saved or {}).items():
+            g = self.gate(f"https://{host}/")
+            g.failures = int(rec.get("failures", 0))
+            g.open_until = float(rec.get("openUntil", 0.0))
+
+    def dump(self) -> dict:
+        return {h: {"failures": g.failures, "openUntil": round(g.open_until, 1)}
+                for h, g in self.gates.items() if g.failures or g.is_open()}
+
+    def report(self):
+        for h, g in sorted(self.gates.items()):
+            state = "open" if g.is_open() else "closed"
+            print(f"[info] host {h}: waited {g.waited:.1f}s for rate limit, breaker {state}, failures={g.failures}")
+
+HOSTS = HostThrottle()
+
+# ---------- HTTP pooling ----------
+
+DESKTOP_UA = ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+              "(KHTML, like Gecko) Chrome/120 Safari/537.36")
+
+class HttpPool:
+    """
+    Keep-alive HTTP(S) connections, one per host, with gzip/deflate decoding.
+    Bodies are streamed; abandoning a stream early drops that host's connection
+    (the unread remainder makes it unusable) and the next request reconnects.
+    """
+    REDIRECTS = (301, 302, 303, 307, 308)
+
+    def __init__(self, timeout: float = 20, user_agent: str = DESKTOP_UA):
+        self.timeout = timeout
+        self.headers = {
+            "User-Agent": user_agent,
+            "Accept": "text/html,application/xhtml+xml,application/json;q=0.9,*/*;q=0.8",
+            "Accept-Encoding": "gzip, deflate",
+            "Connection": "keep-alive",
+        }
+        self._conns = {}
+
+    def _conn(self, scheme: str, host: str):
+        c = self._conns.get((scheme, host))
+        if c is None:
+            cls = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+            c = self._conns[(scheme, host)] = cls(host, timeout=self.timeout)
+        return c
+
+    def _drop(self, scheme: str, host: str):
+        c = self._conns.pop((scheme, host), None)
+        if c is not None:
+            try: c.close()
+            except Exception: pass
+
+    def open(self, url: str, headers: dict = None, max_redirects: int = 5):
+        """GET url following redirects. Returns (final_url, response) with the body unread."""
+        hdrs = dict(self.headers, **(headers or {}))
+        for _ in range(max_redirects + 1):
+            p = urlparse(url)
+            path = (p.path or "/") + (f"?{p.query}" if p.query else "")
+            gate = HOSTS.gate(url)
+            gate.acquire()
+            try:
+                try:
+                    conn = self._conn(p.scheme, p.netloc)
+                    conn.request("GET", path, headers=hdrs)
+                    resp = conn.getresponse()
+                except (http.client.HTTPException, OSError):
+                    # stale keep-alive socket: reconnect once
+                    self._drop(p.scheme, p.netloc)
+                    conn = self._conn(p.scheme, p.netloc)
+                    conn.request("GET", path, headers=hdrs)
+                    resp = conn.getresponse()
+            except (http.client.HTTPException, OSError) as e:
+                gate.failure(type(e).__name__)
+                raise
+            if resp.status in (403, 429) or resp.status >= 500:
+                gate.failure(f"HTTP {resp.status}")
+            else:
+                gate.success()
+            loc = resp.getheader("Location")
+            if resp.status in self.REDIRECTS and loc:
+                resp.read()
+                url = urljoin(url, loc)
+                continue
+            return url, resp
+        raise RuntimeError(f"too many redirects for {url}")
+
+    def iter_text(self, url: str, headers: dict = None, chunk_size: int = 16384):
+        """Generator of decoded text chunks for url; raises on HTTP >= 400."""
+        final, resp = self.open(url, headers=headers)
+        p = urlparse(final)
+        if resp.status >= 400:
+            resp.read()
+            raise RuntimeError(f"HTTP {resp.status} for {final}")
+        enc = (resp.getheader("Content-Encoding") or "").lower()
+        dec = (zlib.decompressobj(16 + zlib.MAX_WBITS) if enc == "gzip"
+               else zlib.decompressobj() if enc == "deflate" else None)
+        text = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+        complete = False
+        try:
+            while True:
+                raw = resp.read(chunk_size)
+                if not raw:
+                    break
+                data = dec.decompress(raw) if dec else raw
+                if data:
+                    yield text.decode(data)
+            complete = True
+            yield text.decode(dec.flush() if dec else b"", final=True)
+        finally:
+            if not complete:
+                self._drop(p.scheme, p.netloc)
+
+    def get_text(self, url: str, headers: dict = None) -> str:
+        return "".join(self.iter_text(url, headers=headers))
+
+    def close(self):
+        for key in list(self._conns):
+            self._drop(*key)
+
+HTTP_POOL = HttpPool()
 
 # ---------- Browser pooling ----------
 
+# ---- Recycling: a context (and its page) is replaced after BROWSER_RECYCLE_NAVS
+# navigations or once the page's JS heap passes BROWSER_HEAP_LIMIT_MB.
+BROWSER_RECYCLE_NAVS  = int(os.getenv("BROWSER_RECYCLE_NAVS", "40"))
+BROWSER_HEAP_LIMIT_MB = float(os.getenv("BROWSER_HEAP_LIMIT_MB", "256"))
+# ---- Persistent profile (optional): with BROWSER_PROFILE_DIR set, each variant runs
+# in launch_persistent_context(<dir>/<variant>) so HTTP disk cache (bounded to
+# BROWSER_DISK_CACHE_MB), cookies and storage survive between runs; the cookie jar
+# is also saved as <dir>/<variant>-storage.json and restored into a fresh profile.
+BROWSER_PROFILE_DIR   = os.path.expanduser(os.getenv("BROWSER_PROFILE_DIR", ""))
+BROWSER_DISK_CACHE_MB = int(os.getenv("BROWSER_DISK_CACHE_MB", "64"))
+
+MOBILE_UA = ("Mozilla/5.0 (Linux; Android 12; Pixel 5) AppleWebKit/537.36 "
+             "(KHTML, like Gecko) Chrome/120 Mobile Safari/537.36")
+
+def _proc_status_mb(pid: int, field: str = "VmRSS") -> float:
+    """VmRSS/VmHWM of a process from /proc (Linux); 0.0 where unavailable."""
+    try:
+        with open(f"/proc/{pid}/status", "r") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) / 1024.0
+    except Exception:
+        pass
+    return 0.0
+
+def _descendant_pids(root: int) -> list:
+    children = {}
+    try:
+        for d in os.listdir("/proc"):
+            if not d.isdigit():
+                continue
+            try:
+                with open(f"/proc/{d}/stat", "r") as f:
+                    ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+            except Exception:
+                continue
+            children.setdefault(ppid, []).append(int(d))
+    except Exception:
+        return []
+    out, todo = [], [root]
+    while todo:
+        for c in children.get(todo.pop(), ()):
+            out.append(c); todo.append(c)
+    return out
+
 class BrowserPool:
-    """Reuse one headless Chromium with two contexts (desktop + mobile)."""
+    """
+    One headless Chromium with a desktop and a mobile context (or one persistent
+    context per variant with BROWSER_PROFILE_DIR). Each context's page is recycled
+    (context closed and reopened) when due; the page's JS heap (CDP Performance
+    metrics), the RSS of the driver + Chromium processes and Python's own RSS are
+    sampled after every navigation and their peaks reported, along with how many
+    responses the HTTP disk cache served.
+    """
+    CONTEXTS = {
+        False: {"user_agent": DESKTOP_UA, "viewport": {"width": 1366, "height": 2000}},
+        True:  {"user_agent": MOBILE_UA, "viewport": {"width": 412, "height": 1800}, "device_scale_factor": 2},
+    }
+
     def __init__(self, p):
-        self.browser = p.chromium.launch(headless=True)
-        self.ctx_desktop = self.browser.new_context(
-            user_agent=("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
-                        "(KHTML, like Gecko) Chrome/120 Safari/537.36"),
-            viewport={"width": 1366, "height": 2000}
-        )
-        self.ctx_mobile = self.browser.new_context(
-            user_agent=("Mozilla/5.0 (Linux; Android 12; Pixel 5) AppleWebKit/537.36 "
-                        "(KHTML, like Gecko) Chrome/120 Mobile Safari/537.36"),
-            viewport={"width": 412, "height": 1800},
-            device_scale_factor=2
-        )
-        self.page_desktop = self.ctx_desktop.new_page()
-        self.page_mobile  = self.ctx_mobile.new_page()
+        self.p = p
+        self.persistent = bool(BROWSER_PROFILE_DIR)
+        self.browser = None if self.persistent else p.chromium.launch(headless=True)
+        self.slots = {}   # mobile -> {"ctx", "page", "cdp", "navs", "heap_mb", "responses"}
+        self.navs = 0
+        self.recycles = 0
+        self.peak_heap_mb = 0.0
+        self.peak_browser_mb = 0.0
+        self.net = {"responses": 0, "cached": 0, "bytes": 0}
+        for mobile in (False, True):
+            self._open(mobile)
+
+    @staticmethod
+    def _variant(mobile: bool) -> str:
+        return "mobile" if mobile else "desktop"
+
+    def _new_context(self, mobile: bool):
+        if not self.persistent:
+            return self.browser.new_context(**self.CONTEXTS[mobile])
+        user_dir = os.path.join(BROWSER_PROFILE_DIR, self._variant(mobile))
+        fresh = not os.path.isdir(user_dir)
+        ctx = self.p.chromium.launch_persistent_context(
+            user_dir, headless=True,
+            args=[f"--disk-cache-size={BROWSER_DISK_CACHE_MB * 2**20}"],
+            **self.CONTEXTS[mobile])
+        saved = os.path.join(BROWSER_PROFILE_DIR, f"{self._variant(mobile)}-storage.json")
+        if fresh and os.path.exists(saved):
+            try:
+                ctx.add_cookies(load_json(saved, {}).get("cookies", []))
+            except Exception as e:
+                print(f"[warn] Restoring {self._variant(mobile)} cookies failed: {e}", file=sys.stderr)
+        return ctx
+
+    def _close_context(self, mobile: bool, ctx):
+        if self.persistent:
+            try:
+                ctx.storage_state(path=os.path.join(BROWSER_PROFILE_DIR, f"{self._variant(mobile)}-storage.json"))
+            except Exception as e:
+                print(f"[warn] Saving {self._variant(mobile)} storage state failed: {e}", file=sys.stderr)
+        try: ctx.close()
+        except Exception: pass
+
+    def _on_network(self, ev: dict):
+        r = ev.get("response") or {}
+        self.net["responses"] += 1
+        if r.get("fromDiskCache") or r.get("fromPrefetchCache"):
+            self.net["cached"] += 1
+
+    def _on_loaded(self, ev: dict):
+        self.net["bytes"] += int(ev.get("encodedDataLength") or 0)
+
+    def _open(self, mobile: bool) -> dict:
+        ctx = self._new_context(mobile)
+        page = ctx.pages[0] if ctx.pages else ctx.new_page()
+        try:
+            cdp = ctx.new_cdp_session(page)
+            cdp.send("Performance.enable")
+            cdp.send("Network.enable")
+            cdp.on("Network.responseReceived", self._on_network)
+            cdp.on("Network.loadingFinished", self._on_loaded)
+        except Exception:
+            cdp = None
+        slot = self.slots[mobile] = {"ctx": ctx, "page": page, "cdp": cdp, "navs": 0, "heap_mb": 0.0,
+                                     "responses": []}
+        page.on("response", lambda resp, slot=slot: self._on_response(slot, resp))
+        return slot
+
+    @staticmethod
+    def _on_response(slot: dict, resp):
+        # Keep the Response handles of same-site XHR/fetch calls; bodies are read later
+        # (after the page settles) by whoever wants them.
+        try:
+            if resp.request.resource_type in ("xhr", "fetch") and resp.ok and \
+                    (urlparse(resp.url).hostname or "").endswith("vesselfinder.com"):
+                slot["responses"].append(resp)
+        except Exception:
+            pass
+
+    def responses(self, mobile: bool) -> list:
+        """XHR/fetch responses captured since the last page(mobile) call."""
+        return self.slots[mobile]["responses"]
+
+    def page(self, mobile: bool):
+        """Page for the next navigation; recycles its context first if it is due."""
+        slot = self.slots[mobile]
+        if slot["navs"] >= BROWSER_RECYCLE_NAVS or slot["heap_mb"] >= BROWSER_HEAP_LIMIT_MB:
+            why = f"{slot['navs']} navigations" if slot["navs"] >= BROWSER_RECYCLE_NAVS else f"heap {slot['heap_mb']:.0f} MB"
+            print(f"[info] Recycling {self._variant(mobile)} browser context ({why})")
+            self._close_context(mobile, slot["ctx"])
+            slot = self._open(mobile)
+            self.recycles += 1
+        slot["navs"] += 1
+        slot["responses"] = []
+        self.navs += 1
+        return slot["page"]
+
+    def sample(self, mobile: bool):
+        slot = self.slots[mobile]
+        if slot["cdp"] is not None:
+            try:
+                metrics = {m["name"]: m["value"] for m in slot["cdp"].send("Performance.getMetrics")["metrics"]}
+                slot["heap_mb"] = metrics.get("JSHeapUsedSize", 0) / 2**20
+                self.peak_heap_mb = max(self.peak_heap_mb, slot["heap_mb"])
+            except Exception:
+                pass
+        rss = sum(_proc_status_mb(pid) for pid in _descendant_pids(os.getpid()))
+        self.peak_browser_mb = max(self.peak_browser_mb, rss)
+
+    def report(self):
+        print(f"[info] Browser memory: {self.navs} navigations, {self.recycles} recycles, "
+              f"peak page JS heap {self.peak_heap_mb:.1f} MB, peak driver+Chromium RSS {self.peak_browser_mb:.0f} MB, "
+              f"peak Python RSS {_proc_status_mb(os.getpid(), 'VmHWM'):.0f} MB")
+        n, hit = self.net["responses"], self.net["cached"]
+        print(f"[info] Browser cache ({'persistent profile' if self.persistent else 'fresh contexts'}): "
+              f"{hit}/{n} responses from disk cache ({(100.0 * hit / n) if n else 0:.0f}%), "
+              f"{self.net['bytes'] / 2**20:.1f} MB transferred")
 
     def close(self):
         try:
-            self.ctx_desktop.close()
+            for mobile, slot in self.slots.items():
+                self._close_context(mobile, slot["ctx"])
         finally:
-            try:
-                self.ctx_mobile.close()
-            finally:
+            if self.browser is not None:
                 self.browser.close()
 
-def _rendered_html(url: str, pool: "BrowserPool", mobile: bool, wait_selector: str = None, wait_text: str = None):
-    page = pool.page_mobile if mobile else pool.page_desktop
-    html = ""
+def _render(url: str, pool: "BrowserPool", mobile: bool, grab, empty, wait_selector: str = None, wait_text: str = None):
+    """
+    Navigate a pooled page and return grab(page, mobile), which yields (result,
+    blocked) for the variant actually rendered.
+    A blocked or failed desktop render is retried once on the mobile context;
+    cooling hosts and blocked/failed mobile renders return `empty`.
+    """
+    gate = HOSTS.gate(url)
+    try:
+        gate.acquire()
+    except HostCooling:
+        return empty   # keep publishing from history until the host recovers
+    page = pool.page(mobile)
     try:
         page.goto(url, timeout=30000, wait_until="domcontentloaded")
         if wait_text:
@@ -650,24 +1568,93 @@ def _rendered_html(url: str, pool: "BrowserPool", mobile: bool, wait_selector: s
             except PWTimeout: pass
         try: page.wait_for_load_state("networkidle", timeout=4000)
         except PWTimeout: pass
-        html = page.content()
-        if not html:
-            # one soft retry
-            _sleep_jitter()
-            html = page.content()
-    except Exception:
-        html = ""
-    if _looks_blocked(html) and not mobile:
-        _sleep_jitter()
+        result, blocked = grab(page, mobile)
+        pool.sample(mobile)
+        failure = "blocked" if blocked else None
+    except Exception as e:
+        result, failure = empty, type(e).__name__
+    if failure is None:
+        gate.success()
+        return result
+    gate.failure(failure)
+    if not mobile:
         parsed = urlparse(url)
         mobile_url = urlunparse(parsed._replace(netloc="www.vesselfinder.com"))
-        return _rendered_html(mobile_url, pool, mobile=True, wait_selector=wait_selector, wait_text=wait_text)
-    _sleep_jitter()
+        return _render(mobile_url, pool, True, grab, empty, wait_selector=wait_selector, wait_text=wait_text)
+    return empty
+
+def _page_html(page) -> str:
+    html = page.content()
+    if not html:
+        # one soft retry (local to the page, no new request)
+        page.wait_for_timeout(300)
+        html = page.content()
     return html
 
+def _grab_html(page, mobile: bool = False):
+    html = _page_html(page)
+    return html, _looks_blocked(html)
+
+def _rendered_html(url: str, pool: "BrowserPool", mobile: bool, wait_selector: str = None, wait_text: str = None):
+    return _render(url, pool, mobile, _grab_html, "", wait_selector=wait_selector, wait_text=wait_text)
+
 # ---------- VF ship-page scraping ----------
 
-def _find_root(soup: BeautifulSoup):
+# ---- Learned root selector: the CSS path (tag.class chain up to the nearest #id) of
+# the container that held the port calls last time, kept per layout variant and
+# persisted as state["vf_root_selectors"]. It is tried first; the text heuristics below
+# only run when it misses. BeautifulSoup variants are "desktop"/"mobile"/"xhr";
+# in-page extraction uses "dom:desktop"/"dom:mobile" (browser DOM adds tbody etc.).
+VF_ROOT_SELECTORS = {}
+VF_ROOT_STATS = {eng: {"hit": 0, "miss": 0, "hit_ms": 0.0, "search_ms": 0.0} for eng in ("html", "dom")}
+
+_CSS_IDENT_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_-]*$")
+_ROOT_LABELS = ("arrival (utc)", "ata (utc)")
+
+def _css_path(node: Tag) -> str:
+    """Selector for node: tag.class steps joined by '>', nth-of-type only where siblings tie."""
+    parts = []
+    while isinstance(node, Tag) and node.name != "[document]":
+        if node.get("id") and _CSS_IDENT_RE.match(node["id"]):
+            parts.append("#" + node["id"])
+            break
+        cls = [c for c in node.get("class", []) if _CSS_IDENT_RE.match(c)]
+        step = node.name + "".join("." + c for c in cls)
+        parent = node.parent
+        if isinstance(parent, Tag):
+            same_tag = parent.find_all(node.name, recursive=False)
+            if sum(1 for c in same_tag if set(cls) <= set(c.get("class", []))) > 1:
+                step += ":nth-of-type(%d)" % (next(i for i, c in enumerate(same_tag) if c is node) + 1)
+        parts.append(step)
+        node = parent
+    return " > ".join(reversed(parts))
+
+_CSS_STEP_RE = re.compile(r"^([a-z0-9]+)((?:\.[A-Za-z_][A-Za-z0-9_-]*)*)(?::nth-of-type\((\d+)\))?$")
+
+def _select_path(soup: BeautifulSoup, sel: str):
+    """Resolve a _css_path selector by walking children step by step (soupsieve scans the whole tree)."""
+    steps = sel.split(" > ")
+    node = soup
+    if steps[0].startswith("#"):
+        node = soup.find(id=steps[0][1:])
+        steps = steps[1:]
+    for step in steps:
+        m = _CSS_STEP_RE.match(step)
+        if node is None or not m:
+            return None
+        name, cls, nth = m.group(1), set(m.group(2).split(".")[1:]), m.group(3)
+        same_tag = node.find_all(name, recursive=False)
+        if nth:
+            k = int(nth) - 1
+            node = same_tag[k] if k < len(same_tag) and cls <= set(same_tag[k].get("class", [])) else None
+        else:
+            node = next((c for c in same_tag if cls <= set(c.get("class", []))), None)
+    return node
+
+def _has_port_labels(node: Tag) -> bool:
+    return node.find(string=lambda s: isinstance(s, str) and any(k in s.lower() for k in _ROOT_LABELS)) is not None
+
+def _search_root(soup: BeautifulSoup):
     for tag in soup.find_all(lambda t: isinstance(t, Tag) and t.name in ("h1","h2","h3","h4","div")):
         txt = (tag.get_text(strip=True) or "").lower()
         if "recent port calls" in txt:
@@ -688,12 +1675,42 @@ def _find_root(soup: BeautifulSoup):
                 return node
     return None
 
-def _parse_vf(html: str):
+def _find_root(soup: BeautifulSoup, variant: str = None):
+    """Port-calls container: the learned selector for `variant` if it still holds port calls, else the heuristics."""
+    stats = VF_ROOT_STATS["html"]
+    sel = VF_ROOT_SELECTORS.get(variant) if variant else None
+    t0 = time.perf_counter()
+    if sel:
+        node = _select_path(soup, sel)
+        if node is not None and _has_port_labels(node):
+            stats["hit"] += 1
+            stats["hit_ms"] += (time.perf_counter() - t0) * 1000.0
+            return node
+    root = _search_root(soup)
+    if variant:
+        stats["miss"] += 1
+        stats["search_ms"] += (time.perf_counter() - t0) * 1000.0
+        if root is not None and _has_port_labels(root):
+            VF_ROOT_SELECTORS[variant] = _css_path(root)
+    return root
+
+def _root_report():
+    for eng, st in VF_ROOT_STATS.items():
+        n = st["hit"] + st["miss"]
+        if not n:
+            continue
+        line = f"[info] VF root selector ({eng}): {st['hit']}/{n} hits ({100.0 * st['hit'] / n:.0f}%)"
+        if st["hit"] and st["miss"]:
+            hit_ms, search_ms = st["hit_ms"] / st["hit"], st["search_ms"] / st["miss"]
+            line += (f", {hit_ms:.1f} ms vs {search_ms:.1f} ms searching; "
+                     f"~{(search_ms - hit_ms) * st['hit']:.0f} ms saved")
+        print(line)
+
+def _parse_vf_blocks(html: str, variant: str = None) -> list:
     soup = BeautifulSoup(html, "html.parser")
-    root = _find_root(soup)
-    results = []
+    root = _find_root(soup, variant)
     if not root:
-        return results
+        return []
 
     def block_has_labels(block: Tag) -> bool:
         txt = (block.get_text(" ", strip=True) or "").lower()
@@ -720,57 +1737,531 @@ def _parse_vf(html: str):
             pass
         return ""
 
-    blocks = [c for c in root.find_all(recursive=False) if isinstance(c, Tag)]
-    for block in blocks:
+    blocks = []
+    for block in (c for c in root.find_all(recursive=False) if isinstance(c, Tag)):
         candidates = [block] + [c for c in block.find_all(recursive=False) if isinstance(c, Tag)]
         matched = next((c for c in candidates if block_has_labels(c)), None)
         if not matched:
             continue
 
         a = matched.find("a")
-        port_name = a.get_text(strip=True) if a else "Unknown Port"
-        port_link = a["href"] if (a and a.has_attr("href")) else ""
-
-        arr_val = value_after_label(matched, ["arrival (utc)", "ata (utc)"])
-        dep_val = value_after_label(matched, ["departure (utc)", "atd (utc)"])
+        blocks.append({
+            "port": a.get_text(strip=True) if a else "Unknown Port",
+            "link": a["href"] if (a and a.has_attr("href")) else "",
+            "arr": value_after_label(matched, ["arrival (utc)", "ata (utc)"]),
+            "dep": value_after_label(matched, ["departure (utc)", "atd (utc)"]),
+        })
+    return blocks
 
-        if arr_val is not None:
-            if arr_val:
-                results.append({"event":"Arrived","port":port_name,"when_raw":arr_val,"link":port_link,
-                                "detail":f"{port_name} Arrival (UTC) {arr_val}"})
-            else:
-                results.append({"event":"Arrived","port":port_name,"when_raw":"","link":port_link,
-                                "detail":f"{port_name} Arrival (UTC) (time not yet posted)"})
+def _vf_rows_from_blocks(blocks: list) -> list:
+    """
+    Port-call blocks {port, link, arr, dep} -> event rows. arr/dep are None when the
+    block has no such label and "" when the label is there but no time is posted yet.
+    """
+    results = []
+    for b in blocks or ():
+        port_name = b.get("port") or "Unknown Port"
+        port_link = b.get("link") or ""
+        for key, event, label in (("arr", "Arrived", "Arrival"), ("dep", "Departed", "Departure")):
+            val = b.get(key)
+            if val is None:
+                continue
+            results.append({"event": event, "port": port_name, "when_raw": val, "link": port_link,
+                            "detail": f"{port_name} {label} (UTC) {val if val else '(time not yet posted)'}"})
+    return results
 
-        if dep_val is not None:
-            if dep_val:
-                results.append({"event":"Departed","port":port_name,"when_raw":dep_val,"link":port_link,
-                                "detail":f"{port_name} Departure (UTC) {dep_val}"})
-            else:
-                results.append({"event":"Departed","port":port_name,"when_raw":"","link":port_link,
-                                "detail":f"{port_name} Departure (UTC) (time not yet posted)"})
+def _parse_vf(html: str, variant: str = None):
+    return _vf_rows_from_blocks(_parse_vf_blocks(html, variant))
+
+# ---- In-browser extraction: VF_EXTRACT_JS mirrors _find_root/_parse_vf_blocks and
+# returns only the port-call blocks, so the serialized DOM never leaves Chromium.
+# VF_EXTRACT: "dom" (script, BeautifulSoup fallback when it finds nothing),
+# "html" (BeautifulSoup only) or "check" (both, logging any disagreement).
+VF_EXTRACT = os.getenv("VF_EXTRACT", "dom")
+VF_EXTRACT_STATS = {"direct": 0, "xhr": 0, "dom": 0, "fallback": 0, "mismatch": 0}
+
+VF_EXTRACT_JS = r"""
+(sel) => {
+  const LABELS = ["arrival (utc)", "departure (utc)", "ata (utc)", "atd (utc)"];
+  const ARR = ["arrival (utc)", "ata (utc)"], DEP = ["departure (utc)", "atd (utc)"];
+  const text = (n) => (n.textContent || "").replace(/\s+/g, " ").trim();
+  const low = document.documentElement.outerHTML.toLowerCase();
+  const blocked = low.includes("captcha") || low.includes("access denied") ||
+                  (low.includes("cf-") && low.includes("turnstile"));
+  if (blocked) return {blocked: true, blocks: []};
+
+  const skipEmpty = (n) => {
+    let hops = 0;
+    while (n && hops < 6 && text(n) === "") { n = n.nextElementSibling; hops++; }
+    return n;
+  };
+  const textNodes = (root, keys) => {
+    const out = [];
+    const w = document.createTreeWalker(root, NodeFilter.SHOW_TEXT);
+    for (let t = w.nextNode(); t; t = w.nextNode()) {
+      const v = t.nodeValue.toLowerCase();
+      if (keys.some((k) => v.includes(k))) out.push(t);
+    }
+    return out;
+  };
+  const ident = (v) => /^[A-Za-z_][A-Za-z0-9_-]*$/.test(v);
+  const cssPath = (el) => {
+    const parts = [];
+    for (let n = el; n && n.nodeType === 1; n = n.parentElement) {
+      if (n.id && ident(n.id)) { parts.push("#" + n.id); break; }
+      const cls = [...n.classList].filter(ident);
+      let step = n.localName + cls.map((c) => "." + c).join("");
+      const p = n.parentElement;
+      if (p) {
+        const sameTag = [...p.children].filter((c) => c.localName === n.localName);
+        if (sameTag.filter((c) => cls.every((k) => c.classList.contains(k))).length > 1)
+          step += `:nth-of-type(${sameTag.indexOf(n) + 1})`;
+      }
+      parts.push(step);
+    }
+    return parts.reverse().join(" > ");
+  };
+  const learned = () => {
+    if (!sel) return null;
+    let el = null;
+    try { el = document.querySelector(sel); } catch (e) { return null; }
+    return el && textNodes(el, ARR).length ? el : null;
+  };
+  const findRoot = () => {
+    for (const el of document.querySelectorAll("h1,h2,h3,h4,div")) {
+      if (!text(el).toLowerCase().includes("recent port calls")) continue;
+      const nxt = skipEmpty(el.nextElementSibling);
+      if (nxt) return nxt;
+    }
+    const labs = textNodes(document.body, ARR);
+    if (!labs.length) return null;
+    let node = labs[0];
+    for (let i = 0; i < 6; i++) {
+      node = node.parentElement;
+      if (!node) break;
+      if (textNodes(node, ARR).length >= 2) return node;
+    }
+    return null;
+  };
+  const valueAfter = (matched, keys) => {
+    let lab = null;
+    for (const k of keys) { lab = textNodes(matched, [k])[0]; if (lab) break; }
+    if (!lab) return null;
+    const nxt = lab.parentElement ? skipEmpty(lab.parentElement.nextElementSibling) : null;
+    return nxt ? text(nxt) : "";
+  };
+
+  const t0 = performance.now();
+  let root = learned();
+  const hit = !!root;
+  if (!root) root = findRoot();
+  const ms = performance.now() - t0;
+  const selector = !hit && root && textNodes(root, ARR).length ? cssPath(root) : null;
+  const blocks = [];
+  if (!root) return {blocked: false, blocks, hit, ms, selector};
+  for (const block of root.children) {
+    const cands = [block, ...block.children];
+    const matched = cands.find((c) => LABELS.some((k) => text(c).toLowerCase().includes(k)));
+    if (!matched) continue;
+    const a = matched.querySelector("a");
+    blocks.push({
+      port: a ? text(a) || "Unknown Port" : "Unknown Port",
+      link: a ? a.getAttribute("href") || "" : "",
+      arr: valueAfter(matched, ARR),
+      dep: valueAfter(matched, DEP),
+    });
+  }
+  return {blocked: false, blocks, hit, ms, selector};
+}
+"""
 
-    return results
+def _cross_check_vf(url: str, dom_rows: list, html_rows: list):
+    key = lambda r: (r["event"], r["port"], r["when_raw"], r["link"])
+    a, b = set(map(key, dom_rows)), set(map(key, html_rows))
+    if a != b:
+        VF_EXTRACT_STATS["mismatch"] += 1
+        print(f"[warn] VF extract mismatch for {url}: dom-only={sorted(a - b)} html-only={sorted(b - a)}", file=sys.stderr)
+
+# ---- Network capture: the port-calls widget is filled by same-site XHR calls. Their
+# responses (JSON or HTML fragments) are parsed directly when they carry port calls;
+# the endpoint that did is remembered as a template ({imo}/{mmsi}) in state.json and,
+# with VF_DIRECT=1, fetched over HTTP_POOL next time without rendering at all.
+# VF_CAPTURE_DIR saves every captured body (fixtures for offline tests).
+VF_DIRECT      = os.getenv("VF_DIRECT", "0") == "1"
+VF_CAPTURE_DIR = os.getenv("VF_CAPTURE_DIR", "")
+VF_ENDPOINT    = {}   # {"template": url, "kind": "json"|"html"}; persisted as state["vf_endpoint"]
+
+_JSON_PORT_KEYS = ("port", "portname", "port_name", "name")
+_JSON_LINK_KEYS = ("link", "url", "href", "porturl", "port_url")
+_JSON_ARR_KEYS  = ("arrival", "arrivalutc", "arrival_utc", "ata", "ata_utc", "arr")
+_JSON_DEP_KEYS  = ("departure", "departureutc", "departure_utc", "atd", "atd_utc", "dep")
+
+def _json_time(v):
+    if v is None:
+        return ""   # key present, time not yet posted
+    if isinstance(v, (int, float)) and v > 0:
+        ts = v / 1000.0 if v > 1e11 else v   # epoch ms or s
+        return datetime.fromtimestamp(ts, tz=timezone.utc).strftime("%b %d, %H:%M")
+    return str(v).strip()
+
+def _vf_blocks_from_json(obj) -> list:
+    """Port-call blocks from any JSON shape: objects holding a port plus arrival/departure keys."""
+    blocks = []
+    def walk(o):
+        if isinstance(o, list):
+            for x in o:
+                walk(x)
+            return
+        if not isinstance(o, dict):
+            return
+        low = {str(k).lower(): v for k, v in o.items()}
+        arr_k = next((k for k in _JSON_ARR_KEYS if k in low), None)
+        dep_k = next((k for k in _JSON_DEP_KEYS if k in low), None)
+        port = next((low[k] for k in _JSON_PORT_KEYS if k in low), None)
+        if (arr_k or dep_k) and port:
+            link = next((low[k] for k in _JSON_LINK_KEYS if k in low), "")
+            if isinstance(port, dict):
+                plow = {str(k).lower(): v for k, v in port.items()}
+                link = link or next((plow[k] for k in _JSON_LINK_KEYS if k in plow), "")
+                port = next((plow[k] for k in _JSON_PORT_KEYS if k in plow), "")
+            blocks.append({"port": str(port).strip() or "Unknown Port", "link": str(link or ""),
+                           "arr": _json_time(low[arr_k]) if arr_k else None,
+                           "dep": _json_time(low[dep_k]) if dep_k else None})
+            return
+        for v in o.values():
+            walk(v)
+    walk(obj)
+    return blocks
+
+def _vf_rows_from_body(body: str, kind: str) -> list:
+    if kind == "json":
+        try:
+            return _vf_rows_from_blocks(_vf_blocks_from_json(json.loads(body)))
+        except ValueError:
+            return []
+    low = body.lower()
+    if not any(k in low for k in ("arrival (utc)", "ata (utc)", "departure (utc)", "atd (utc)")):
+        return []
+    return _parse_vf(body, "xhr")
 
-def _vf_events_for_ship(pool: "BrowserPool", ship):
-    base_url = ship["url"]
-    # Desktop first
+def _save_capture(url: str, body: str, kind: str):
     try:
-        html = _rendered_html(base_url, pool, mobile=False, wait_text="Recent Port Calls")
-        rows = _parse_vf(html)
-        if rows: return rows, base_url
+        os.makedirs(VF_CAPTURE_DIR, exist_ok=True)
+        p = urlparse(url)
+        name = re.sub(r"[^A-Za-z0-9._-]+", "_", f"{p.path.strip('/')}_{p.query}").strip("_")[:120] or "root"
+        with open(os.path.join(VF_CAPTURE_DIR, f"{name}.{kind}"), "w", encoding="utf-8") as f:
+            f.write(body)
     except Exception as e:
-        print(f"[warn] desktop VF render failed for {ship['name']}: {e}", file=sys.stderr)
-    # Mobile fallback
+        print(f"[warn] capture save failed for {url}: {e}", file=sys.stderr)
+
+def _rows_from_responses(responses: list, ship: dict = None) -> list:
+    """Rows from the first captured XHR body that carries port calls; learns its endpoint."""
+    for resp in responses:
+        try:
+            ctype = (resp.headers.get("content-type") or "").lower()
+            kind = "json" if "json" in ctype else "html" if ("html" in ctype or "text" in ctype) else None
+            if kind is None:
+                continue
+            body = resp.text()
+        except Exception:
+            continue
+        if VF_CAPTURE_DIR:
+            _save_capture(resp.url, body, kind)
+        rows = _vf_rows_from_body(body, kind)
+        if not rows:
+            continue
+        template = resp.url
+        for field in ("imo", "mmsi"):
+            v = str((ship or {}).get(field) or "")
+            if v and v in template:
+                template = template.replace(v, "{%s}" % field)
+        if "{" in template and VF_ENDPOINT.get("template") != template:
+            VF_ENDPOINT.update(template=template, kind=kind)
+            print(f"[info] Learned VF port-calls endpoint ({kind}): {template}")
+        return rows
+    return []
+
+def _vf_rows_direct(ship: dict) -> list:
+    """Call the learned port-calls endpoint over HTTP_POOL (VF_DIRECT=1); [] when unknown/failed."""
+    template = VF_ENDPOINT.get("template")
+    if not (VF_DIRECT and template):
+        return []
     try:
-        parsed = urlparse(base_url)
-        mobile_url = urlunparse(parsed._replace(netloc="www.vesselfinder.com"))
-        html = _rendered_html(mobile_url, pool, mobile=True, wait_text="Recent Port Calls")
-        rows = _parse_vf(html)
-        if rows: return rows, mobile_url
+        url = template.format(imo=ship.get("imo", ""), mmsi=ship.get("mmsi", ""))
+        body = HTTP_POOL.get_text(url, headers={"X-Requested-With": "XMLHttpRequest", "Referer": ship["url"]})
+        return _vf_rows_from_body(body, VF_ENDPOINT.get("kind", "html"))
     except Exception as e:
-        print(f"[warn] mobile VF render failed for {ship['name']}: {e}", file=sys.stderr)
-    return [], base_url
+        print(f"[warn] direct VF fetch failed for {ship['name']}: {e}", file=sys.stderr)
+        return []
+
+def _dom_root_result(res: dict, variant: str):
+    stats = VF_ROOT_STATS["dom"]
+    if res.get("hit"):
+        stats["hit"] += 1
+        stats["hit_ms"] += res.get("ms") or 0.0
+    else:
+        stats["miss"] += 1
+        stats["search_ms"] += res.get("ms") or 0.0
+        if res.get("selector"):
+            VF_ROOT_SELECTORS[variant] = res["selector"]
+
+def _grab_vf_rows(page, responses: list, ship: dict, mobile: bool):
+    """
+    (rows, blocked) for a rendered VF ship page: captured XHR, then per VF_EXTRACT.
+    `mobile` must be the context the page was rendered in; it picks the learned
+    root selectors to try and to update.
+    """
+    variant = "mobile" if mobile else "desktop"
+    captured = _rows_from_responses(responses or (), ship)
+    if captured and VF_EXTRACT != "check":
+        VF_EXTRACT_STATS["xhr"] += 1
+        return captured, False
+
+    rows = None
+    if VF_EXTRACT != "html":
+        try:
+            res = page.evaluate(VF_EXTRACT_JS, VF_ROOT_SELECTORS.get("dom:" + variant))
+            if res.get("blocked"):
+                return [], True
+            _dom_root_result(res, "dom:" + variant)
+            rows = _vf_rows_from_blocks(res.get("blocks"))
+        except Exception as e:
+            print(f"[warn] in-page VF extraction failed: {e}", file=sys.stderr)
+    if rows and VF_EXTRACT != "check":
+        VF_EXTRACT_STATS["dom"] += 1
+        return rows, False
+
+    html = _page_html(page)
+    if _looks_blocked(html):
+        return [], True
+    html_rows = _parse_vf(html, variant)
+    if VF_EXTRACT == "check":
+        if rows is not None:
+            _cross_check_vf(page.url, rows, html_rows)
+        if captured:
+            _cross_check_vf(page.url + " (xhr)", captured, html_rows)
+    if rows:
+        VF_EXTRACT_STATS["dom"] += 1
+        return rows, False
+    if not html_rows and captured:
+        VF_EXTRACT_STATS["xhr"] += 1
+        return captured, False
+    if VF_EXTRACT != "html":
+        VF_EXTRACT_STATS["fallback"] += 1
+    return html_rows, False
+
+# ---- Hedged rendering: desktop starts alone; if it has no port calls after the p95
+# of recent desktop time-to-rows (VF_HEDGE_DEFAULT_MS until 10 samples exist), or it
+# is blocked, the mobile render starts alongside and the first one with rows wins.
+# The whole render is capped at VF_RENDER_BUDGET_MS (the old per-variant worst case);
+# a leg whose page finished loading without port-call labels gives up after
+# VF_LOADED_GRACE_MS (the old networkidle wait) instead of holding the budget.
+VF_HEDGE            = os.getenv("VF_HEDGE", "1") == "1"
+VF_HEDGE_PCTL       = float(os.getenv("VF_HEDGE_PCTL", "95"))
+VF_HEDGE_DEFAULT_MS = int(os.getenv("VF_HEDGE_DEFAULT_MS", "8000"))
+VF_HEDGE_BOUNDS_MS  = (2000, 10000)
+VF_RENDER_BUDGET_MS = int(os.getenv("VF_RENDER_BUDGET_MS", "20000"))
+VF_LOADED_GRACE_MS  = int(os.getenv("VF_LOADED_GRACE_MS", "4000"))
+VF_LATENCY          = {}   # slug -> recent desktop time-to-rows (ms); persisted as state["vf_latency"]
+VF_LATENCY_PER_SHIP = 10
+
+VF_READY_JS = r"""
+() => {
+  const t = ((document.body && document.body.innerText) || "").toLowerCase();
+  if (t.includes("captcha") || t.includes("access denied")) return "blocked";
+  if (/arrival \(utc\)|ata \(utc\)|departure \(utc\)|atd \(utc\)/.test(t)) return "ready";
+  return document.readyState === "complete" ? "loaded" : "";
+}
+"""
+
+def _note_latency(ship: dict, ms: int):
+    xs = VF_LATENCY.setdefault(ship.get("slug") or ship.get("name", ""), [])
+    xs.append(ms)
+    del xs[:-VF_LATENCY_PER_SHIP]
+
+def _hedge_threshold_ms() -> int:
+    xs = sorted(ms for per_ship in VF_LATENCY.values() for ms in per_ship)
+    if len(xs) < 10:
+        return VF_HEDGE_DEFAULT_MS
+    p = xs[min(len(xs) - 1, int(round(VF_HEDGE_PCTL / 100.0 * (len(xs) - 1))))]
+    return int(max(VF_HEDGE_BOUNDS_MS[0], min(VF_HEDGE_BOUNDS_MS[1], p)))
+
+class _RenderLeg:
+    """One variant (desktop or mobile) of a hedged ship-page render."""
+    def __init__(self, pool: "BrowserPool", mobile: bool, url: str, ship: dict):
+        self.pool, self.mobile, self.url, self.ship = pool, mobile, url, ship
+        self.gate = HOSTS.gate(url)
+        self.page = None
+        self.state = "pending"   # -> "done" | "failed"
+        self.rows = []
+        self.checked = 0         # captured responses already parsed
+        self.empty_grabs = 0
+        self.loaded_at = None    # monotonic time the page loaded without labels
+
+    @property
+    def label(self) -> str:
+        return "mobile" if self.mobile else "desktop"
+
+    def _fail(self, why: str):
+        self.state = "failed"
+        self.gate.failure(why)
+
+    def start(self):
+        try:
+            self.gate.acquire()
+        except HostCooling:
+            self.state = "failed"
+            return
+        self.page = self.pool.page(self.mobile)
+        try:
+            # returns once the response starts; the page keeps loading while we poll
+            self.page.goto(self.url, timeout=30000, wait_until="commit")
+        except Exception as e:
+            self._fail(type(e).__name__)
+
+    def poll(self):
+        responses = self.pool.responses(self.mobile)
+        if len(responses) > self.checked:
+            rows = _rows_from_responses(responses[self.checked:], self.ship)
+            self.checked = len(responses)
+            if rows:
+                VF_EXTRACT_STATS["xhr"] += 1
+                return self._done(rows)
+        try:
+            ready = self.page.evaluate(VF_READY_JS)
+        except Exception:
+            return   # mid-navigation; try again on the next tick
+        if ready == "blocked":
+            return self._fail("blocked")
+        if ready == "loaded":
+            self.loaded_at = self.loaded_at or time.monotonic()
+            if (time.monotonic() - self.loaded_at) * 1000 < VF_LOADED_GRACE_MS:
+                return
+            self.empty_grabs = 2   # one last grab below, then give up
+        elif ready != "ready":
+            return
+        rows, blocked = _grab_vf_rows(self.page, None, self.ship, mobile=self.mobile)
+        if blocked:
+            return self._fail("blocked")
+        if rows:
+            return self._done(rows)
+        self.empty_grabs += 1
+        if self.empty_grabs >= 3:
+            self.state = "failed"
+
+    def _done(self, rows: list):
+        self.state = "done"
+        self.rows = rows
+        self.gate.success()
+        self.pool.sample(self.mobile)
+
+    def cancel(self):
+        if self.page is not None and self.state == "pending":
+            try: self.page.evaluate("window.stop()")
+            except Exception: pass
+
+def _vf_hedged(pool: "BrowserPool", ship: dict, base_url: str, mobile_url: str):
+    """Hedged desktop/mobile render; returns (rows, url) of the first variant with rows."""
+    t0 = time.monotonic()
+    elapsed = lambda: int((time.monotonic() - t0) * 1000)
+    hedge_ms = _hedge_threshold_ms()
+    desk, mob, hedged_at, winner = _RenderLeg(pool, False, base_url, ship), None, None, None
+    desk.start()
+    while elapsed() < VF_RENDER_BUDGET_MS:
+        for leg in (desk, mob):
+            if leg is not None and leg.state == "pending":
+                leg.poll()
+                if leg.state == "done":
+                    winner = leg
+                    break
+        if winner:
+            break
+        if mob is None and (desk.state == "failed" or elapsed() >= hedge_ms):
+            hedged_at = elapsed()
+            mob = _RenderLeg(pool, True, mobile_url, ship)
+            mob.start()
+        pending = [l for l in (desk, mob) if l is not None and l.state == "pending"]
+        if not pending:
+            break
+        pending[0].page.wait_for_timeout(150)   # lets both pages keep loading
+    for leg in (desk, mob):
+        if leg is not None and leg is not winner:
+            leg.cancel()
+
+    won_ms = elapsed()
+    if winner is desk:
+        _note_latency(ship, won_ms)
+    elif winner is mob or desk.state == "pending":
+        # desktop had no rows by the time mobile won (or the budget ran out): record it
+        # as censored at the budget so slow desktop renders keep pulling the p95 up
+        _note_latency(ship, VF_RENDER_BUDGET_MS)
+    if winner is not None and hedged_at is not None:
+        note = ""
+        if winner is mob:
+            # serially, mobile could only have started after desktop gave up (>= won_ms)
+            note = f"; desktop {desk.state}, latency saved >= {won_ms - hedged_at} ms"
+        print(f"[info] Hedge {ship['name']}: {winner.label} won at {won_ms} ms (mobile started at {hedged_at} ms, "
+              f"threshold {hedge_ms} ms{note})")
+    if winner is None:
+        return [], base_url
+    return winner.rows, winner.url
+
+VF_TTD = []   # this run's rendered ship-page time-to-rows (ms)
+
+def _vf_events_for_ship(pool: "BrowserPool", ship):
+    base_url = ship["url"]
+    parsed = urlparse(base_url)
+    mobile_url = urlunparse(parsed._replace(netloc="www.vesselfinder.com"))
+    rows = _vf_rows_direct(ship)
+    if rows:
+        VF_EXTRACT_STATS["direct"] += 1
+        return rows, base_url
+    t0 = time.monotonic()
+    rows, url = [], base_url
+    if VF_HEDGE:
+        try:
+            rows, url = _vf_hedged(pool, ship, base_url, mobile_url)
+        except Exception as e:
+            print(f"[warn] hedged VF render failed for {ship['name']}: {e}", file=sys.stderr)
+    else:
+        # Desktop first, then the mobile context
+        grab = lambda page, m: _grab_vf_rows(page, pool.responses(m), ship, mobile=m)
+        for mobile, u in ((False, base_url), (True, mobile_url)):
+            try:
+                rows = _render(u, pool, mobile, grab, [], wait_text="Recent Port Calls")
+                if rows:
+                    url = u
+                    break
+            except Exception as e:
+                print(f"[warn] {'mobile' if mobile else 'desktop'} VF render failed for {ship['name']}: {e}", file=sys.stderr)
+    if rows:
+        VF_TTD.append(int((time.monotonic() - t0) * 1000))
+    return rows, url
+
+def _ttd_report(state: dict, persistent: bool):
+    """Median time-to-rows this run, and per browser mode over recent runs (state["ttd"])."""
+    hist = state.setdefault("ttd", {})
+    mode = "persistent" if persistent else "fresh"
+    hist[mode] = (hist.get(mode, []) + VF_TTD)[-200:]
+    med = lambda xs: sorted(xs)[len(xs) // 2] if xs else None
+    parts = [f"{m} {med(hist[m])} ms (n={len(hist[m])})" for m in ("fresh", "persistent") if hist.get(m)]
+    print(f"[info] VF time-to-data: this run median {med(VF_TTD)} ms over {len(VF_TTD)} ships; "
+          f"recent {', '.join(parts) or 'n/a'}")
+
+def _vf_row_fingerprint(r: dict) -> str:
+    """Compact per-row fingerprint; any change to verb, port, raw time or link is a new row."""
+    return make_id(f"{r.get('event', '')}|{r.get('port', '')}|{r.get('when_raw', '')}|{r.get('link', '')}")[:12]
+
+def diff_vf_rows(rows: list, previous: list):
+    """
+    Split parsed Recent Port Calls rows against last run's fingerprints.
+    Returns (fresh_rows, fingerprints_of_rows, dropped_count); fresh rows keep page order.
+    """
+    prev = set(previous or ())
+    prints = [_vf_row_fingerprint(r) for r in rows]
+    fresh = [r for r, fp in zip(rows, prints) if fp not in prev]
+    dropped = len(prev.difference(prints))
+    return fresh, prints, dropped
 
 # ---------- CruiseMapper coordinate scrape (HTTP, no Playwright) ----------
 
@@ -779,9 +2270,29 @@ COORD_RE = re.compile(
     re.IGNORECASE
 )
 
+# Targeted position patterns, most specific first. Each yields (lat, lon) or
+# (lat, N/S, lon, E/W); nothing here matches an arbitrary number pair.
+CM_COORD_PATTERNS = [
+    # embedded JSON / JS map config: "lat": 26.08, "lon": -77.54 (lng/long/longitude too)
+    re.compile(r'["\']?lat(?:itude)?["\']?\s*[:=]\s*["\']?([+-]?\d{1,2}\.\d+)["\']?\s*[,;]\s*'
+               r'["\']?(?:lon|lng|long|longitude)["\']?\s*[:=]\s*["\']?([+-]?\d{1,3}\.\d+)', re.I),
+    # data attributes on the map element
+    re.compile(r'data-lat(?:itude)?=["\']([+-]?\d{1,2}\.\d+)["\'][^>]*?'
+               r'data-(?:lon|lng|longitude)=["\']([+-]?\d{1,3}\.\d+)["\']', re.I),
+    # <meta ... latitude ... content="..."> followed by the longitude meta
+    re.compile(r'<meta[^>]+latitude["\'][^>]*content=["\']([+-]?\d{1,2}\.\d+)["\'][^>]*>\s*'
+               r'<meta[^>]+longitude["\'][^>]*content=["\']([+-]?\d{1,3}\.\d+)["\']', re.I),
+    # visible position field: "coordinates 28.40698 N / 80.61985 W"
+    re.compile(r'(?:coordinates|position)\W{0,40}?' + COORD_RE.pattern, re.I),
+]
+CM_SCAN_OVERLAP = 1024   # chars carried between streamed chunks so a match can straddle them
+
 def _cm_slug(name: str) -> str:
     return "-".join(part for part in name.split())
 
+def _valid_coords(lat: float, lon: float) -> bool:
+    return -90.0 <= lat <= 90.0 and -180.0 <= lon <= 180.0 and not (lat == 0.0 and lon == 0.0)
+
 def _parse_coords(text: str):
     m = COORD_RE.search(text or "")
     if not m: return None
@@ -791,22 +2302,43 @@ def _parse_coords(text: str):
     if ew and ew.upper() == "W": lon = -abs(lon)
     return (lat, lon)
 
-def _cm_fetch_coords_http(cm_url: str, timeout=20):
+def _cm_match_coords(text: str):
+    """First targeted position match in text, or None."""
+    for rx in CM_COORD_PATTERNS:
+        for m in rx.finditer(text or ""):
+            g = m.groups()
+            if len(g) == 2:
+                lat, lon = float(g[0]), float(g[1])
+            else:
+                lat, ns, lon, ew = g
+                lat = float(lat); lon = float(lon)
+                if ns and ns.upper() == "S": lat = -abs(lat)
+                if ew and ew.upper() == "W": lon = -abs(lon)
+            if _valid_coords(lat, lon):
+                return (lat, lon)
+    return None
+
+def _cm_extract_coords(chunks):
+    """Scan streamed HTML text chunks; stops reading as soon as a position is found."""
+    buf = ""
+    for chunk in chunks:
+        buf = buf[-CM_SCAN_OVERLAP:] + chunk
+        hit = _cm_match_coords(buf)
+        if hit:
+            return hit
+    return None
+
+def _cm_fetch_coords_http(cm_url: str):
+    chunks = None
     try:
-        req = urllib.request.Request(
-            cm_url,
-            headers={"User-Agent": ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-                                    "AppleWebKit/537.36 (KHTML, like Gecko) "
-                                    "Chrome/120 Safari/537.36")}
-        )
-        with urllib.request.urlopen(req, timeout=timeout) as resp:
-            html = resp.read().decode("utf-8", errors="ignore")
-        soup = BeautifulSoup(html, "html.parser")
-        txt = soup.get_text(" ", strip=True)
-        return _parse_coords(txt)
+        chunks = HTTP_POOL.iter_text(cm_url)
+        return _cm_extract_coords(chunks)
     except Exception as e:
         print(f"[warn] CruiseMapper HTTP failed: {e}", file=sys.stderr)
         return None
+    finally:
+        if chunks is not None:
+            chunks.close()
 
 def haversine_km(a, b):
     R = 6371.0
@@ -816,82 +2348,257 @@ def haversine_km(a, b):
     h = math.sin(dlat/2)**2 + math.cos(lat1)*math.cos(lat2)*math.sin(dlon/2)**2
     return 2*R*math.asin(math.sqrt(h))
 
-def geofence_events_from_coords(ship_name: str, slug: str, coords, state_seen):
-    items = []
+def bearing_deg(a, b):
+    """Initial great-circle bearing a -> b in degrees (0 = north)."""
+    lat1, lat2 = math.radians(a[0]), math.radians(b[0])
+    dlon = math.radians(b[1] - a[1])
+    x = math.sin(dlon) * math.cos(lat2)
+    y = math.cos(lat1)*math.sin(lat2) - math.sin(lat1)*math.cos(lat2)*math.cos(dlon)
+    return (math.degrees(math.atan2(x, y)) + 360.0) % 360.0
+
+# ---------- Position tracks + dwell inference ----------
+
+_TRK_REC = struct.Struct("<Iff")   # epoch seconds, lat, lon (float32 ≈ 1 m)
+
+class PositionTrack:
+    """
+    Append-only position track for one ship, stored as packed (epoch, lat, lon)
+    records in history/tracks/<slug>.trk. The file is read through mmap into
+    parallel arrays so time-range queries are a bisect; speed/heading are derived
+    from consecutive fixes. Retention is bounded by age and fix count.
+    """
+    def __init__(self, slug: str, track_dir: str = None):
+        self.path = os.path.join(track_dir or TRACK_DIR, f"{slug}.trk")
+        self.ts  = array("I")
+        self.lat = array("f")
+        self.lon = array("f")
+        self._load()
+
+    def __len__(self):
+        return len(self.ts)
+
+    def _load(self):
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            return
+        usable = size - (size % _TRK_REC.size)   # ignore a torn trailing record
+        if usable <= 0:
+            return
+        try:
+            with open(self.path, "rb") as f, mmap.mmap(f.fileno(), usable, access=mmap.ACCESS_READ) as mm:
+                for t, la, lo in _TRK_REC.iter_unpack(mm):
+                    if self.ts and t <= self.ts[-1]:
+                        continue
+                    self.ts.append(t); self.lat.append(la); self.lon.append(lo)
+        except Exception as e:
+            print(f"[warn] Failed to read track {self.path}: {e}", file=sys.stderr)
+
+    def append(self, when: datetime, coords) -> bool:
+        """Append one fix (ignored unless strictly newer than the last). Returns True if stored."""
+        t = int(when.timestamp())
+        if self.ts and t <= self.ts[-1]:
+            return False
+        la, lo = float(coords[0]), float(coords[1])
+        self.ts.append(t); self.lat.append(la); self.lon.append(lo)
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, "ab") as f:
+                f.write(_TRK_REC.pack(t, la, lo))
+        except Exception as e:
+            print(f"[warn] Failed to append track {self.path}: {e}", file=sys.stderr)
+        self.prune(t)
+        return True
+
+    def prune(self, now_epoch: int, force: bool = False):
+        """
+        Drop fixes older than TRACK_RETENTION_DAYS or beyond TRACK_MAX_FIXES (rewrites
+        the file). Unless forced, this waits until the track is TRACK_PRUNE_SLACK past
+        either bound, so appends stay appends and the rewrite is amortized.
+        """
+        if not self.ts:
+            return
+        max_age = TRACK_RETENTION_DAYS * 86400
+        if not force and (now_epoch - self.ts[0] <= max_age * (1 + TRACK_PRUNE_SLACK)
+                          and len(self.ts) <= TRACK_MAX_FIXES * (1 + TRACK_PRUNE_SLACK)):
+            return
+        start = bisect.bisect_left(self.ts, now_epoch - max_age)
+        start = max(start, len(self.ts) - TRACK_MAX_FIXES)
+        if start <= 0:
+            return
+        self.ts, self.lat, self.lon = self.ts[start:], self.lat[start:], self.lon[start:]
+        tmp = self.path + ".tmp"
+        try:
+            with open(tmp, "wb") as f:
+                f.write(b"".join(_TRK_REC.pack(*r) for r in zip(self.ts, self.lat, self.lon)))
+            os.replace(tmp, self.path)
+        except Exception as e:
+            print(f"[warn] Failed to compact track {self.path}: {e}", file=sys.stderr)
+
+    def index_range(self, t0=None, t1=None):
+        """Half-open index range [i, j) of fixes with t0 <= ts <= t1 (epoch seconds)."""
+        i = 0 if t0 is None else bisect.bisect_left(self.ts, int(t0))
+        j = len(self.ts) if t1 is None else bisect.bisect_right(self.ts, int(t1))
+        return i, j
+
+    def fixes(self, t0=None, t1=None):
+        """[(epoch, lat, lon, sog_kn, cog_deg)] for fixes in [t0, t1]; sog/cog are None for the first fix."""
+        i, j = self.index_range(t0, t1)
+        return [(self.ts[k], self.lat[k], self.lon[k], self.speed_kn(k), self.heading_deg(k)) for k in range(i, j)]
+
+    def speed_kn(self, k: int):
+        """Mean speed over the leg ending at fix k, in knots."""
+        if k <= 0 or k >= len(self.ts):
+            return None
+        dt_h = (self.ts[k] - self.ts[k-1]) / 3600.0
+        if dt_h <= 0:
+            return None
+        d = haversine_km((self.lat[k-1], self.lon[k-1]), (self.lat[k], self.lon[k]))
+        return d / 1.852 / dt_h
+
+    def heading_deg(self, k: int):
+        if k <= 0 or k >= len(self.ts):
+            return None
+        return bearing_deg((self.lat[k-1], self.lon[k-1]), (self.lat[k], self.lon[k]))
+
+    def dwell_runs(self, center, radius_km: float, t0=None, t1=None):
+        """
+        Runs of stationary legs inside a fence as [(start_epoch, end_epoch)].
+        A leg k-1 -> k counts when both fixes are inside and its speed is
+        <= DWELL_MAX_KN, so start/end are accurate to one sampling interval.
+        """
+        i, j = self.index_range(t0, t1)
+        runs = []
+        cur = None
+        for k in range(max(i, 1), j):
+            sog = self.speed_kn(k)
+            dwell = (sog is not None and sog <= DWELL_MAX_KN
+                     and haversine_km((self.lat[k-1], self.lon[k-1]), center) <= radius_km
+                     and haversine_km((self.lat[k], self.lon[k]), center) <= radius_km)
+            if dwell:
+                if cur is None:
+                    cur = [self.ts[k-1], self.ts[k]]
+                else:
+                    cur[1] = self.ts[k]
+            elif cur is not None:
+                runs.append(tuple(cur)); cur = None
+        if cur is not None:
+            runs.append(tuple(cur))
+        return runs
+
+    def is_dwelling(self, center, radius_km: float) -> bool:
+        """True if the most recent leg is a stationary leg inside the fence."""
+        n = len(self.ts)
+        if n < 2:
+            return False
+        runs = self.dwell_runs(center, radius_km, t0=self.ts[n-2])
+        return bool(runs) and runs[-1][1] == self.ts[-1]
+
+def _geo_event(ship_name: str, slug: str, verb: str, fence_name: str, when_utc: datetime):
+    when_utc = when_utc.astimezone(timezone.utc).replace(second=0, microsecond=0)
+    detail = f"{fence_name} {'Arrival' if verb == 'Arrived' else 'Departure'} (UTC) {when_utc.strftime('%b %d, %H:%M')}"
+    return make_event(slug, ship_name, verb, fence_name, when_utc,
+                      port_tz_name("", fence_name), "", detail, "geo")
+
+def geofence_events_from_coords(ship_name: str, slug: str, coords, state_seen, track: "PositionTrack" = None):
+    """
+    ShipEvents for fence transitions. With a track of >= 2 fixes,
+    "inside" means dwelling (stopped inside the fence) and the event time is the
+    start/end of the dwell run; otherwise it is the raw fence test stamped "now".
+    The two tests disagree (passing through vs stopped), so geo_state records the
+    mode ("_mode"; state from before tracks is "raw") and a mode switch, e.g. a
+    track lost with the actions cache, re-seeds the fence states without alerting.
+    """
+    events = []
     if coords is None:
-        return items
+        return events
 
     geo_state = state_seen.setdefault("geo", {}).setdefault(slug, {})
     now_utc = datetime.utcnow().replace(tzinfo=timezone.utc)
-
-    for fence_name, info in SPECIAL_GEOFENCES.items():
-        center = info["center"]
-        radius = info["radius_km"]
-        dist = haversine_km(coords, center)
-        inside = dist <= radius
+    use_track = track is not None and len(track) >= 2
+    mode = "dwell" if use_track else "raw"
+    reseed = geo_state.get("_mode", "raw") != mode
+    if reseed and any(k != "_mode" for k in geo_state):
+        print(f"[info] {ship_name}: geofence mode {geo_state.get('_mode', 'raw')} -> {mode}, re-seeding without alerts")
+    geo_state["_mode"] = mode
+
+    for fence in port_registry().geofences():
+        fence_name = fence.name
+        center = tuple(fence.geofence["center"])
+        radius = fence.geofence["radius_km"]
+        if use_track:
+            inside = track.is_dwelling(center, radius)
+        else:
+            inside = haversine_km(coords, center) <= radius
         key = fence_name
         prev = geo_state.get(key)
 
-        if prev is None:
+        if prev is None or reseed:
             geo_state[key] = inside
             continue
 
-        if inside and not prev:
-            when_raw = now_utc.strftime("%b %d, %H:%M")
-            est_str, local_str, event_iso = format_times_for_notification(fence_name, "", when_raw)
-            title = f"{ship_name} Arrived at {fence_name} at {est_str or 'time TBD ET'}"
-            if local_str:
-                title += f". The local time to the port is {local_str}"
-            desc = f"{fence_name} Arrival (UTC) {now_utc.strftime('%b %d, %H:%M')} — Geofence"
-            guid = _canonical_guid(slug, "Arrived", fence_name, event_iso or now_utc.isoformat())
-            items.append({
-                "title": title,
-                "description": desc,
-                "link": "",
-                "guid": guid,
-                "pubDate": to_rfc2822(now_utc),
-                "eventUtc": event_iso or now_utc.isoformat(),
-                "shipSlug": slug,
-                "shipName": ship_name,
-                "source": "geo",
-                # explicit fields for webhook convenience:
-                "eventType": "Arrived",
-                "portName": fence_name,
-                "estLabel": est_str or "",
-                "localLabel": local_str or ""
-            })
-
-        elif (not inside) and prev:
-            when_raw = now_utc.strftime("%b %d, %H:%M")
-            est_str, local_str, event_iso = format_times_for_notification(fence_name, "", when_raw)
-            title = f"{ship_name} Departed from {fence_name} at {est_str or 'time TBD ET'}"
-            if local_str:
-                title += f". The local time to the port is {local_str}"
-            desc = f"{fence_name} Departure (UTC) {now_utc.strftime('%b %d, %H:%M')} — Geofence"
-            guid = _canonical_guid(slug, "Departed", fence_name, event_iso or now_utc.isoformat())
-            items.append({
-                "title": title,
-                "description": desc,
-                "link": "",
-                "guid": guid,
-                "pubDate": to_rfc2822(now_utc),
-                "eventUtc": event_iso or now_utc.isoformat(),
-                "shipSlug": slug,
-                "shipName": ship_name,
-                "source": "geo",
-                # explicit fields for webhook convenience:
-                "eventType": "Departed",
-                "portName": fence_name,
-                "estLabel": est_str or "",
-                "localLabel": local_str or ""
-            })
+        if inside != prev:
+            when_utc = now_utc
+            runs = track.dwell_runs(center, radius) if use_track else []
+            if runs:
+                when_utc = datetime.fromtimestamp(runs[-1][0] if inside else runs[-1][1], tz=timezone.utc)
+            events.append(_geo_event(ship_name, slug, "Arrived" if inside else "Departed", fence_name, when_utc))
 
         geo_state[key] = inside
 
-    return items
+    return events
 
 # ---------- Port-page fallback ----------
 
+# ---- Parse offload (opt-in): port-table HTML is parsed by PARSE_WORKERS processes
+# while the browser renders the next tab/port; 0 (default) parses inline on the main
+# thread. Workers come from a forkserver (spawn where unavailable), never a fork of
+# this process, and main() starts them before the Playwright driver threads exist.
+PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", "0"))
+_PARSE_POOL = None
+
+def _parse_pool():
+    global _PARSE_POOL
+    if _PARSE_POOL is None and PARSE_WORKERS > 0:
+        method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        _PARSE_POOL = ProcessPoolExecutor(max_workers=PARSE_WORKERS, mp_context=multiprocessing.get_context(method))
+    return _PARSE_POOL
+
+def _start_parse_pool():
+    """Create the pool and its worker processes up front (before sync_playwright())."""
+    ex = _parse_pool()
+    if ex is not None:
+        for fut in [ex.submit(int) for _ in range(PARSE_WORKERS)]:
+            fut.result()
+
+def _close_parse_pool():
+    global _PARSE_POOL
+    if _PARSE_POOL is not None:
+        _PARSE_POOL.shutdown(cancel_futures=True)
+        _PARSE_POOL = None
+
+def _parse_inline(fn, *args) -> Future:
+    fut = Future()
+    try:
+        fut.set_result(fn(*args))
+    except Exception as e:
+        fut.set_exception(e)
+    return fut
+
+def _submit_parse(fn, *args) -> Future:
+    """Run fn(*args) in the parse pool; inline (already resolved) without one."""
+    global PARSE_WORKERS
+    ex = _parse_pool()
+    if ex is not None:
+        try:
+            return ex.submit(fn, *args)
+        except (BrokenProcessPool, RuntimeError) as e:
+            # a dead worker breaks the whole pool: parse inline for the rest of the run
+            print(f"[warn] Parse pool unavailable ({e}); parsing inline", file=sys.stderr)
+            PARSE_WORKERS = 0
+            _close_parse_pool()
+    return _parse_inline(fn, *args)
+
 def _ensure_tab(url: str, tab: str) -> str:
     parsed = urlparse(url)
     qs = parse_qs(parsed.query)
@@ -899,93 +2606,178 @@ def _ensure_tab(url: str, tab: str) -> str:
     new_q = urlencode({k: v[0] if isinstance(v, list) else v for k, v in qs.items()})
     return urlunparse(parsed._replace(query=new_q))
 
-def _parse_port_time_lt(raw_time: str, tz: ZoneInfo):
-    raw = (raw_time or "").strip()
-    for fmt in ("%b %d, %H:%M", "%b %d, %I:%M %p"):
-        try:
-            base = datetime.strptime(raw, fmt).replace(year=datetime.utcnow().year)
-            local = base.replace(tzinfo=tz)
-            utc_dt = local.astimezone(timezone.utc)
-            eastern = zinfo_eastern()
-            est_dt = utc_dt.astimezone(eastern) if eastern else utc_dt
-            return est_dt.strftime("%b %d, %I:%M %p %Z"), local.strftime("%b %d, %I:%M %p %Z"), utc_dt.isoformat()
-        except Exception:
-            continue
-    return None, None, None
+def _parse_port_time_lt(raw_time: str, tz: ZoneInfo, now: datetime = None):
+    fields = _vf_time_fields((raw_time or "").strip())
+    local = _infer_year(fields, tz or timezone.utc, now) if fields else None
+    if not local:
+        return None, None, None
+    utc_dt = local.astimezone(timezone.utc)
+    eastern = zinfo_eastern()
+    est_dt = utc_dt.astimezone(eastern) if eastern else utc_dt
+    return est_dt.strftime("%b %d, %I:%M %p %Z"), local.strftime("%b %d, %I:%M %p %Z"), utc_dt.isoformat()
 
 def _port_tz_from_url(port_url: str, fallback_name: str):
-    tz = _port_zoneinfo_from_link(port_url)
-    if tz: return tz
-    return _port_zoneinfo_from_name(fallback_name)
+    return zinfo(port_tz_name(port_url or "", fallback_name or ""))
+
+VESSEL_IMO_RE = re.compile(r"(?:/details/|IMO-)(\d{7})(?!\d)")
+
+def _vessel_key(name: str) -> str:
+    """Normalized vessel name used for exact (never substring) lookups."""
+    return re.sub(r"[^a-z0-9]+", " ", (name or "").lower()).strip()
 
-def _parse_port_table_for_ship(html: str, ship_name: str, port_url: str, tab_kind: str, port_label: str):
+class PortTable(NamedTuple):
+    """One parsed VF port tab: ship-agnostic event rows indexed by IMO and vessel name."""
+    by_imo: dict
+    by_name: dict
+
+    def rows_for(self, ship_name: str, imo: str = None) -> list:
+        # IMO first; the name key must equal a whole cell/link text, so "Disney Wish"
+        # never picks up a "Disney Wish II" row.
+        if imo and imo in self.by_imo:
+            return self.by_imo[imo]
+        return self.by_name.get(_vessel_key(ship_name), [])
+
+def _parse_port_table(html: str, port_url: str, tab_kind: str, port_label: str) -> "PortTable":
     """
-    Parse a VF port Arrivals/Departures page and emit rows for the named ship.
+    Walk a VF port Arrivals/Departures table once. Vessel identity comes from the
+    row's /vessels/ link (IMO + link text) or, without a link, each cell's text.
     tab_kind: 'arrivals' or 'departures'
     """
-    soup = BeautifulSoup(html, "html.parser")
+    by_imo, by_name = {}, {}
+    soup = BeautifulSoup(html or "", "html.parser")
     table = soup.find("table")
     if not table:
-        return []
+        return PortTable(by_imo, by_name)
 
-    rows = []
     tz = _port_tz_from_url(port_url, port_label)
+    event = "Arrived" if tab_kind == "arrivals" else "Departed"
+    label = "Arrival" if event == "Arrived" else "Departure"
 
-    # Look for a row with the ship name; be lenient about where LT lives
     for tr in table.find_all("tr"):
         tds = tr.find_all("td")
         if len(tds) < 2:
             continue
-        txt = tr.get_text(" ", strip=True)
-        if ship_name.lower() not in txt.lower():
-            continue
-
-        candidates = []
-        if tds:
-            candidates.append(tds[0].get_text(strip=True))
-        if len(tds) > 1:
-            candidates.append(tds[1].get_text(strip=True))
-        lt = next((c for c in candidates if c), "").replace("(LT)", "").replace("LT", "").strip()
+        cells = [td.get_text(" ", strip=True) for td in tds]
 
+        # Be lenient about where LT lives (first or second column)
+        lt = next((c for c in cells[:2] if c), "").replace("(LT)", "").replace("LT", "").strip()
         est_str, local_str, iso_utc = _parse_port_time_lt(lt, tz)
         if not iso_utc:
             continue
 
-        event = "Arrived" if tab_kind == "arrivals" else "Departed"
-        port_name = port_label
-        detail = f"{port_name} {'Arrival' if event=='Arrived' else 'Departure'} (UTC) {datetime.fromisoformat(iso_utc).strftime('%b %d, %H:%M')}"
-
-        rows.append({
+        keys, imos = set(), set()
+        for a in tr.find_all("a", href=True):
+            if "/vessels/" not in a["href"]:
+                continue
+            m = VESSEL_IMO_RE.search(a["href"])
+            if m:
+                imos.add(m.group(1))
+            keys.add(_vessel_key(a.get_text(" ", strip=True)))
+        if not keys:
+            keys = {_vessel_key(c) for c in cells}
+        keys.discard("")
+
+        when = datetime.fromisoformat(iso_utc).strftime("%b %d, %H:%M")
+        row = {
             "event": event,
-            "port": port_name,
-            "when_raw": datetime.fromisoformat(iso_utc).strftime("%b %d, %H:%M"),
+            "port": port_label,
+            "when_raw": when,
             "link": port_url,
-            "detail": detail,
+            "detail": f"{port_label} {label} (UTC) {when}",
             "_est": est_str,
             "_local": local_str,
             "_iso": iso_utc,
             "_source": f"port:{tab_kind}"
-        })
-    return rows
+        }
+        for k in keys:
+            by_name.setdefault(k, []).append(row)
+        for imo in imos:
+            by_imo.setdefault(imo, []).append(row)
+    return PortTable(by_imo, by_name)
+
+def _table_region(html: str) -> str:
+    """First <table>...</table> of a page (all _parse_port_table reads), or ''."""
+    low = (html or "").lower()
+    i = low.find("<table")
+    j = low.find("</table>", i) if i != -1 else -1
+    return html[i:j + len("</table>")] if j != -1 else ""
+
+class PortTableCache:
+    """
+    Rendered VF port Arrivals/Departures pages, fetched at most once per run per
+    (port, tab) and parsed once into a PortTable shared by every ship that falls
+    back to that port. The mobile context is only tried when the desktop render
+    has no table at all. Parses are futures (see _submit_parse), so prefetch()
+    keeps the browser rendering while earlier tabs are still being parsed.
+    """
+    def __init__(self, pool: "BrowserPool"):
+        self.pool = pool
+        self.pages = {}
+        self.tables = {}
+        self.rendered = 0
+        self.reused = 0
+
+    def html(self, port_url: str, tab: str) -> str:
+        url = _ensure_tab(urljoin("https://www.vesselfinder.com", port_url), tab)
+        if url in self.pages:
+            self.reused += 1
+            return self.pages[url]
+        self.rendered += 1
+        html = _rendered_html(url, self.pool, mobile=False, wait_selector="table")
+        if "<table" not in html.lower():
+            parsed = urlparse(url)
+            mobile_url = urlunparse(parsed._replace(netloc="www.vesselfinder.com"))
+            html = _rendered_html(mobile_url, self.pool, mobile=True, wait_selector="table")
+        # cache misses too (one attempt per port per run); only the table region is kept
+        html = self.pages[url] = _table_region(html)
+        return html
+
+    def _future(self, port_url: str, tab: str, port_label: str) -> Future:
+        key = (port_url, tab, port_label)
+        fut = self.tables.get(key)
+        if fut is None:
+            html = self.html(port_url, tab)
+            fut = self.tables[key] = _submit_parse(_parse_port_table, html, port_url, tab, port_label)
+        return fut
+
+    def prefetch(self, candidates: list, tabs=("departures", "arrivals")):
+        """Render every (port, tab) up front; their parses overlap the remaining renders."""
+        for port_url, label in candidates:
+            for tab in tabs:
+                try:
+                    self._future(port_url, tab, label or port_url)
+                except Exception as e:
+                    print(f"[warn] Port page {label or port_url} ({tab}) failed: {e}", file=sys.stderr)
 
-def _fetch_port_fallback_events(pool: "BrowserPool", ship_name: str, candidate_links_with_labels: list):
+    def table(self, port_url: str, tab: str, port_label: str) -> "PortTable":
+        fut = self._future(port_url, tab, port_label)
+        try:
+            return fut.result()
+        except BrokenProcessPool as e:
+            # the worker died mid-parse: redo it here from the cached HTML
+            print(f"[warn] Parse worker lost on {port_label} ({tab}): {e}", file=sys.stderr)
+            fut = self.tables[(port_url, tab, port_label)] = _parse_inline(
+                _parse_port_table, self.html(port_url, tab), port_url, tab, port_label)
+            return fut.result()
+
+    def report(self):
+        if self.rendered or self.reused:
+            print(f"[info] Port tables: {self.rendered} rendered, {self.reused} reused across ships"
+                  + (f", parsed in {PARSE_WORKERS} worker processes" if PARSE_WORKERS > 0 else ""))
+
+def _fetch_port_fallback_events(ports: "PortTableCache", ship_name: str, candidate_links_with_labels: list,
+                                imo: str = None):
     """
     Try multiple port links (and both tabs). Each candidate is (port_url, port_label).
-    Returns aggregated rows for the ship across all tried pages.
+    Returns aggregated rows for the ship across all tried pages, in candidate order.
     """
     out = []
     seen = set()
+    ports.prefetch(candidate_links_with_labels)
     for port_url, label in candidate_links_with_labels:
         for tab in ("departures", "arrivals"):
             try:
-                url = _ensure_tab(urljoin("https://www.vesselfinder.com", port_url), tab)
-                html = _rendered_html(url, pool, mobile=False, wait_selector="table")
-                rows = _parse_port_table_for_ship(html, ship_name, port_url, tab, label or port_url)
-                if not rows:
-                    parsed = urlparse(url)
-                    mobile_url = urlunparse(parsed._replace(netloc="www.vesselfinder.com"))
-                    html_m = _rendered_html(mobile_url, pool, mobile=True, wait_selector="table")
-                    rows = _parse_port_table_for_ship(html_m, ship_name, port_url, tab, label or port_url)
+                rows = ports.table(port_url, tab, label or port_url).rows_for(ship_name, imo)
 
                 for r in rows:
                     key = (r["event"], r["port"], r["_iso"])
@@ -1007,317 +2799,511 @@ def _most_recent_event_iso(items):
     except Exception:
         return None
 
-# ---------- Main ----------
-
-def main():
-    os.makedirs(DOCS_DIR, exist_ok=True)
-
-    ships = load_json(SHIPS_PATH, [])
-    if not ships:
-        print(f"[error] ships.json not found or empty at {SHIPS_PATH}", file=sys.stderr)
-        return  # nothing to do
-
-    # name -> slug lookup (for latest-all fallback)
-    slug_by_name = {s["name"]: s["slug"] for s in ships}
+# ---------- Ship registry + sharding ----------
 
-    state = load_json(STATE_PATH, {"seen": {}, "geo": {}, "canon_seen": {}})
-    if "seen" not in state: state["seen"] = {}
-    if "geo" not in state: state["geo"] = {}
-    canon_seen = state.setdefault("canon_seen", {})
+class ShipRegistry:
+    """
+    Vessels from ships.json plus fleets/<fleet>.json, keyed by IMO (then MMSI,
+    then slug for rows without either). The first row for a vessel wins.
+    """
+    def __init__(self, rows: list):
+        self.ships = []
+        self.by_key = {}
+        self.by_slug = {}
+        for s in rows:
+            name = s.get("name"); slug = s.get("slug")
+            if not (name and slug and s.get("url")):
+                print(f"[warn] skipping malformed ship entry: {s}", file=sys.stderr)
+                continue
+            key = self.vessel_key(s)
+            if key in self.by_key or slug in self.by_slug:
+                print(f"[warn] duplicate vessel {key} ({slug}) in registry; keeping the first entry", file=sys.stderr)
+                continue
+            self.ships.append(s)
+            self.by_key[key] = s
+            self.by_slug[slug] = s
+
+    @staticmethod
+    def vessel_key(s: dict) -> str:
+        for field in ("imo", "mmsi"):
+            v = str(s.get(field) or "").strip()
+            if v:
+                return f"{field}:{v}"
+        return f"slug:{s.get('slug', '')}"
+
+    @classmethod
+    def load(cls, ships_path: str = SHIPS_PATH, fleets_dir: str = FLEETS_DIR):
+        rows = [dict(s, fleet=s.get("fleet") or DEFAULT_FLEET) for s in load_json(ships_path, [])]
+        if os.path.isdir(fleets_dir):
+            for fn in sorted(os.listdir(fleets_dir)):
+                if fn.endswith(".json"):
+                    fleet = fn[:-len(".json")]
+                    rows += [dict(s, fleet=s.get("fleet") or fleet)
+                             for s in load_json(os.path.join(fleets_dir, fn), [])]
+        return cls(rows)
+
+    def fleets(self) -> list:
+        return list(dict.fromkeys(s["fleet"] for s in self.ships))
+
+    def shard_of(self, s: dict, count: int) -> int:
+        """Stable 0-based shard for a vessel (crc32 of its registry key)."""
+        return zlib.crc32(self.vessel_key(s).encode("utf-8")) % count
+
+    def select(self, shard=None, fleets=None) -> list:
+        """shard = (index, count) with a 0-based index; fleets = iterable of fleet ids."""
+        out = self.ships
+        if fleets:
+            wanted = set(fleets)
+            out = [s for s in out if s["fleet"] in wanted]
+        if shard:
+            idx, count = shard
+            out = [s for s in out if self.shard_of(s, count) == idx]
+        return out
+
+def parse_shard(spec: str):
+    """'I/N' (1-based, as in a CI matrix) -> (I-1, N)."""
+    m = re.fullmatch(r"\s*(\d+)\s*/\s*(\d+)\s*", spec or "")
+    if not m or not (1 <= int(m.group(1)) <= int(m.group(2))):
+        raise argparse.ArgumentTypeError(f"expected I/N with 1 <= I <= N, got {spec!r}")
+    return int(m.group(1)) - 1, int(m.group(2))
+
+def _run_state_path(shard=None, fleets=None) -> str:
+    """state.json for full runs; a per-worker file for sharded or fleet-filtered runs."""
+    if not (shard or fleets):
+        return STATE_PATH
+    parts = []
+    if fleets:
+        parts.append("fleet-" + "+".join(sorted(fleets)))
+    if shard:
+        parts.append(f"shard-{shard[0] + 1}-of-{shard[1]}")
+    return os.path.join(SHARD_STATE_DIR, "_".join(parts) + ".json")
+
+def load_run_state(path: str) -> dict:
+    # A new worker file starts from the merged state so nothing already alerted is re-sent.
+    state = load_json(path, None)
+    if state is None:
+        state = load_json(STATE_PATH, {})
+    state.setdefault("seen", {})
+    state.setdefault("geo", {})
+    state.setdefault("canon_seen", {})
+    return state
+
+def fold_shard_states(state: dict) -> list:
+    """
+    Union every worker state file into state, oldest "savedAt" first so a fresher
+    worker's hosts/ttd/geo/vf entries win over a stale one (e.g. a file left by
+    an earlier shard count). Per-slug keys (SHARD_OWNED_KEYS) only hold the
+    worker's own ships, so one worker never overwrites another's vessels with the
+    copy it started from. Returns the paths folded.
+    """
+    if not os.path.isdir(SHARD_STATE_DIR):
+        return []
+    parts = []
+    for fn in os.listdir(SHARD_STATE_DIR):
+        if not fn.endswith(".json"):
+            continue
+        path = os.path.join(SHARD_STATE_DIR, fn)
+        part = load_json(path, {})
+        saved = part.pop("savedAt", None) or datetime.utcfromtimestamp(os.path.getmtime(path)).isoformat()
+        parts.append((saved, fn, path, part))
+    parts.sort(key=lambda t: t[:2])
+    for _, _, _, part in parts:
+        for key, val in part.items():
+            if isinstance(val, dict):
+                state.setdefault(key, {}).update(val)
+    return [path for _, _, path, _ in parts]
+
+def _merged_top(hists, cap: int) -> list:
+    """Newest `cap` items across already-sorted histories (k-way merge, no full sort)."""
+    return list(islice(heapq.merge(*hists, key=_event_key, reverse=True), cap))
+
+class CombinedPublisher:
+    """
+    Combined, fleet, latest-one-per-ship and index outputs, derived from the per-ship
+    histories so a full run and the merge step after sharded runs agree. Histories
+    are loaded once (ALL_CAP deep); update() folds in a ship's fresh history as soon
+    as it finishes.
+    """
+    def __init__(self, registry: "ShipRegistry"):
+        self.registry = registry
+        self.hists = {s["slug"]: load_history(s["slug"], ALL_CAP) for s in registry.ships}
+        self.published = False
 
-    all_items_new = []
+    def update(self, slug: str, ship_hist: list, publish: bool = False):
+        self.hists[slug] = merge_items(self.hists.get(slug, []), ship_hist, ALL_CAP)
+        if publish:
+            self.publish()
 
-    _ensure_stylesheet_dcl()
+    def publish(self):
+        self.published = True
+        registry, hists = self.registry, self.hists
 
-    with sync_playwright() as p:
-        pool = BrowserPool(p)
+        all_hist = _merged_top(hists.values(), ALL_CAP)
         try:
-            for s in ships:
-                name = s.get("name"); slug = s.get("slug"); vf_url = s.get("url")
-                if not (name and slug and vf_url):
-                    print(f"[warn] skipping malformed ship entry: {s}", file=sys.stderr)
-                    continue
-
-                print(f"[info] Fetching VF for {name}: {vf_url}")
-
-                # 1) VesselFinder port-calls (ship page)
+            all_xml, current = build_current_feed("all", "DCL Ships - Arrivals & Departures (All)", "https://github.com/",
+                                                  all_hist, [s["slug"] for s in registry.ships])
+            all_xml = _pretty_xml(all_xml)
+            _write_feed(os.path.join(DOCS_DIR, "all.xml"), all_xml)
+            _write_feed(os.path.join(DOCS_DIR, "all.json"),
+                        build_json_snapshot("DCL Ships - Arrivals & Departures (All)", "all", current))
+        except Exception as e:
+            print(f"[error] Writing all.xml failed: {e}", file=sys.stderr)
+
+        # Fleet-level feeds only once there is more than one fleet (otherwise they equal all.xml)
+        fleets = registry.fleets()
+        if len(fleets) > 1:
+            for fleet in fleets:
+                feed = f"fleet-{fleet}"
+                slugs = [s["slug"] for s in registry.ships if s["fleet"] == fleet]
+                fleet_hist = _merged_top([hists[slug] for slug in slugs], ALL_CAP)
                 try:
-                    rows, used = _vf_events_for_ship(pool, s)
-                    print(f"[info] Parsed VF {name}: {len(rows)} events")
+                    title = f"{fleet.upper()} Ships - Arrivals & Departures"
+                    fleet_xml, current = build_current_feed(feed, title, "https://github.com/", fleet_hist, slugs)
+                    _write_feed(os.path.join(DOCS_DIR, f"{feed}.xml"), _pretty_xml(fleet_xml))
+                    _write_feed(os.path.join(DOCS_DIR, f"{feed}.json"),
+                                build_json_snapshot(title, feed, current))
                 except Exception as e:
-                    print(f"[error] VF parse failed for {name}: {e}\n{traceback.format_exc()}", file=sys.stderr)
-                    rows = []
-                    used = vf_url
+                    print(f"[error] Writing {feed}.xml failed: {e}", file=sys.stderr)
 
-                ship_items_new = []
+        # ---- Latest one per ship (newest real event in each ship's own history) ----
+        latest_all = []
+        for hist in hists.values():
+            newest = next((it for it in hist if not _is_tba(it)), None)
+            if newest:
+                latest_all.append(newest)
+        latest_all.sort(key=_event_key, reverse=True)
 
-                # 1a) Build items from ship page rows
-                for r in rows:
-                    try:
-                        est_str, local_str, event_iso = format_times_for_notification(
-                            r.get("port",""), r.get("link",""), r.get("when_raw","")
-                        )
-                        verb = "Arrived" if r.get("event") == "Arrived" else "Departed"
-                        title_verb = "Arrived at" if verb == "Arrived" else "Departed from"
-
-                        if (not event_iso) and SKIP_TBA.get(verb, False):
-                            continue
-
-                        if est_str and local_str:
-                            title = f"{name} {title_verb} {r['port']} at {est_str}. The local time to the port is {local_str}"
-                        elif est_str:
-                            title = f"{name} {title_verb} {r['port']} at {est_str}"
-                        else:
-                            continue
-
-                        base_desc = r.get("detail","").replace(" (UTC) -", " (UTC) (time not yet posted)")
-                        if est_str and local_str:
-                            desc = f"{base_desc} — ET: {est_str} | Local: {local_str}"
-                        elif est_str:
-                            desc = f"{base_desc} — ET: {est_str}"
-                        else:
-                            desc = base_desc
-
-                        link = urljoin(vf_url, r.get("link","")) if r.get("link") else vf_url
-
-                        event_iso_final = event_iso
-                        if not event_iso_final:
-                            continue
-
-                        guid = _canonical_guid(slug, verb, r['port'], event_iso_final)
-                        if canon_seen.get(guid):
-                            continue
-
-                        item = {
-                            "title": title,
-                            "description": desc,
-                            "link": link,
-                            "guid": guid,
-                            "pubDate": to_rfc2822(datetime.utcnow()),
-                            "eventUtc": event_iso_final,
-                            "shipSlug": slug,
-                            "shipName": name,
-                            "source": "vf_ship"
-                        }
-                        ship_items_new.append(item)
-                        all_items_new.append(item)
-                        canon_seen[guid] = True
-
-                        # ---- email notify (JSON attachment)
-                        post_flow_webhook({
-                            "ShipName":   name,
-                            "EventType":  verb,                 # Arrived | Departed
-                            "PortName":   r["port"],
-                            "ESTLabel":   est_str or "",
-                            "LocalLabel": local_str or "",
-                            "Link":       link or "",
-                            "Title":      title,
-                            "GuidKey":    guid,
-                            "PubDate":    item["pubDate"],
-                            "Description": desc
-                        })
-
-                    except Exception as e:
-                        print(f"[warn] VF item build failed for {name}: {e}", file=sys.stderr)
-
-                # Decide whether to skip port fallback (recent event within X hours)
-                recent_iso = _most_recent_event_iso(ship_items_new)
-                now_utc = datetime.utcnow().replace(tzinfo=timezone.utc)
-                skip_fallback = bool(recent_iso and (now_utc - recent_iso) < timedelta(hours=18))
-
-                # 2) Port-page fallback (limit candidates)
-                if not skip_fallback:
-                    try:
-                        candidate_links = []
-                        if rows and rows[0].get("link"):
-                            candidate_links.append((rows[0]["link"], rows[0].get("port","")))
-
-                        for hp in s.get("home_ports", []):
-                            if isinstance(hp, str):
-                                candidate_links.append((hp, ""))
-                            elif isinstance(hp, dict):
-                                link = hp.get("link","")
-                                label = hp.get("label","")
-                                if link:
-                                    candidate_links.append((link, label))
-
-                        dedup = {}
-                        for u,lbl in candidate_links:
-                            if u and u not in dedup:
-                                dedup[u] = lbl
-                        candidate_links = [(u, dedup[u]) for u in dedup.keys()]
-
-                        if not candidate_links:
-                            dflt = DEFAULT_PORTS_BY_SHIP.get(name, [])
-                            if dflt:
-                                candidate_links = [(d["link"], d.get("label","")) for d in dflt if d.get("link")]
-                            else:
-                                candidate_links = [(d["link"], d.get("label","")) for d in GLOBAL_FALLBACK_PORTS]
-
-                        # keep it snappy
-                        candidate_links = candidate_links[:3]
-
-                        if candidate_links:
-                            port_rows = _fetch_port_fallback_events(pool, name, candidate_links)
-                            print(f"[info] Port fallback {name} using {len(candidate_links)} port(s): {len(port_rows)} rows")
-
-                            for r in port_rows:
-                                try:
-                                    verb = r["event"]
-                                    est_str, local_str, event_iso = r.get("_est"), r.get("_local"), r.get("_iso")
-                                    title_verb = "Arrived at" if verb == "Arrived" else "Departed from"
-                                    title = f"{name} {title_verb} {r['port']} at {est_str}. The local time to the port is {local_str}"
-
-                                    base_desc = r.get("detail","")
-                                    desc = f"{base_desc} — ET: {est_str} | Local: {local_str}"
-
-                                    link = urljoin("https://www.vesselfinder.com", r.get("link",""))
-
-                                    guid = _canonical_guid(slug, verb, r['port'], event_iso)
-                                    if canon_seen.get(guid):
-                                        continue
-
-                                    item = {
-                                        "title": title,
-                                        "description": desc,
-                                        "link": link,
-                                        "guid": guid,
-                                        "pubDate": to_rfc2822(datetime.utcnow()),
-                                        "eventUtc": event_iso,
-                                        "shipSlug": slug,
-                                        "shipName": name,
-                                        "source": "vf_port"
-                                    }
-                                    ship_items_new.append(item)
-                                    all_items_new.append(item)
-                                    canon_seen[guid] = True
-
-                                    # ---- email notify (JSON attachment)
-                                    post_flow_webhook({
-                                        "ShipName":   name,
-                                        "EventType":  verb,
-                                        "PortName":   r["port"],
-                                        "ESTLabel":   est_str or "",
-                                        "LocalLabel": local_str or "",
-                                        "Link":       link or "",
-                                        "Title":      title,
-                                        "GuidKey":    guid,
-                                        "PubDate":    item["pubDate"],
-                                        "Description": desc
-                                    })
-
-                                except Exception as e:
-                                    print(f"[warn] Port-fallback build failed for {name}: {e}", file=sys.stderr)
-                    except Exception as e:
-                        print(f"[warn] Port fallback failed for {name}: {e}", file=sys.stderr)
-
-                # 3) Geofence (CruiseMapper coords via HTTP)
-                cm_url = s.get("cm_url") or f"https://www.cruisemapper.com/ships/{_cm_slug(name)}"
-                try:
-                    coords = _cm_fetch_coords_http(cm_url)
-                    if coords:
-                        geo_items = geofence_events_from_coords(name, slug, coords, state)
-                        for it in geo_items:
-                            if canon_seen.get(it["guid"]):
-                                continue
-                            ship_items_new.append(it)
-                            all_items_new.append(it)
-                            canon_seen[it["guid"]] = True
-
-                            # ---- email notify (JSON attachment)
-                            post_flow_webhook({
-                                "ShipName":   it["shipName"],
-                                "EventType":  it.get("eventType",""),
-                                "PortName":   it.get("portName",""),
-                                "ESTLabel":   it.get("estLabel",""),
-                                "LocalLabel": it.get("localLabel",""),
-                                "Link":       it.get("link",""),
-                                "Title":      it.get("title",""),
-                                "GuidKey":    it.get("guid",""),
-                                "PubDate":    it.get("pubDate",""),
-                                "Description": it.get("description","")
-                            })
-
-                    else:
-                        print(f"[warn] No coords from CruiseMapper for {name} ({cm_url})")
-                except Exception as e:
-                    print(f"[warn] Geofence failed for {name}: {e}", file=sys.stderr)
+        try:
+            latest_all_xml = build_rss("DCL Ships - Latest (One per Ship)", "https://github.com/", latest_all)
+            latest_all_xml = _pretty_xml(latest_all_xml)
+            _write_feed(os.path.join(DOCS_DIR, "latest-all.xml"), latest_all_xml)
+            _write_feed(os.path.join(DOCS_DIR, "latest.xml"), latest_all_xml)
+            _write_feed(os.path.join(DOCS_DIR, "latest-all.json"),
+                        build_json_snapshot("DCL Ships - Latest (One per Ship)", "latest-all", latest_all))
+        except Exception as e:
+            print(f"[error] Writing latest-all.xml failed: {e}", file=sys.stderr)
 
-                # ---- PER SHIP HISTORY (sorted by event time) ----
-                ship_hist = load_history(slug)
-                ship_hist = merge_items(ship_hist, ship_items_new, PER_SHIP_CAP)
-                save_history(slug, ship_hist)
+        try:
+            ship_stats = {slug: (min(len(h), PER_SHIP_CAP), h[0] if h else None) for slug, h in hists.items()}
+            _write_if_changed(os.path.join(DOCS_DIR, "index.json"),
+                              build_site_index(registry.ships, ship_stats, len(all_hist), _newest_pub_date(all_hist)))
+        except Exception as e:
+            print(f"[error] Writing index.json failed: {e}", file=sys.stderr)
 
-                # DEBUG metrics
-                print(f"[debug] {name} new_items: ship_page={len([i for i in ship_items_new if i.get('source')=='vf_ship'])} "
-                      f"port_fallback={len([i for i in ship_items_new if i.get('source')=='vf_port'])} "
-                      f"geo={len([i for i in ship_items_new if i.get('source')=='geo'])} "
-                      f"total_added_this_run={len(ship_items_new)} "
-                      f"hist_after_merge={len(ship_hist)}")
+# ---------- Run pipeline ----------
+#
+# Per ship: sources -> normalize -> dedupe -> deliver, chained as generators so each
+# event is built, checked and alerted once, in order. Sources are lazy: the port
+# fallback only decides whether to run after the ship-page events have been
+# delivered. publish_ship() then writes that ship's history and feeds straight away.
+
+class ShipRun:
+    """One ship's pass through the pipeline: registry row, parsed VF rows, accepted items."""
+    def __init__(self, ship: dict):
+        self.ship = ship
+        self.name = ship["name"]
+        self.slug = ship["slug"]
+        self.url = ship["url"]
+        self.rows = []        # VF Recent Port Calls rows (rows[0] seeds the port fallback)
+        self.failed = set()   # fingerprints of VF rows whose item build raised
+        self.items = []       # items accepted this run, in delivery order
+        self.updates = {}     # guid -> ShipEvent replacing that entry (near-duplicate, better source)
+        self._hist = None
+        self._index = None
+
+    def history(self) -> list:
+        if self._hist is None:
+            self._hist = load_history(self.slug)
+        return self._hist
+
+    def index(self) -> "EventIndex":
+        if self._index is None:
+            self._index = EventIndex.from_items(self.history())
+        return self._index
+
+def vf_source(run: "ShipRun", pool: "BrowserPool", state: dict):
+    """VF ship-page rows that are new or changed since last run."""
+    print(f"[info] Fetching VF for {run.name}: {run.url}")
+    try:
+        run.rows, _ = _vf_events_for_ship(pool, run.ship)
+        print(f"[info] Parsed VF {run.name}: {len(run.rows)} events")
+    except Exception as e:
+        print(f"[error] VF parse failed for {run.name}: {e}\n{traceback.format_exc()}", file=sys.stderr)
+        run.rows = []
+
+    snapshots = state.setdefault("vf_rows", {})
+    fresh, prints, dropped = diff_vf_rows(run.rows, snapshots.get(run.slug))
+    if run.rows:
+        print(f"[info] VF diff {run.name}: {len(fresh)} new/changed, {len(run.rows) - len(fresh)} unchanged, "
+              f"{dropped} dropped")
+    for r in fresh:
+        yield "vf", r
+    if run.rows:
+        # an empty/failed render keeps the old snapshot; failed rows are retried next run
+        snapshots[run.slug] = [fp for fp in prints if fp not in run.failed]
+
+def _port_candidates(run: "ShipRun") -> list:
+    """(link, label) pairs: last VF port, then home_ports, else per-ship/global defaults; max 3."""
+    candidate_links = []
+    if run.rows and run.rows[0].get("link"):
+        candidate_links.append((run.rows[0]["link"], run.rows[0].get("port","")))
+
+    for hp in run.ship.get("home_ports", []):
+        if isinstance(hp, str):
+            candidate_links.append((hp, ""))
+        elif isinstance(hp, dict):
+            link = hp.get("link","")
+            label = hp.get("label","")
+            if link:
+                candidate_links.append((link, label))
+
+    dedup = {}
+    for u,lbl in candidate_links:
+        if u and u not in dedup:
+            dedup[u] = lbl
+    candidate_links = [(u, dedup[u]) for u in dedup.keys()]
+
+    if not candidate_links:
+        dflt = run.ship.get("default_ports") or DEFAULT_PORTS_BY_SHIP.get(run.name, [])
+        if dflt:
+            candidate_links = [(d["link"], d.get("label","")) for d in dflt if d.get("link")]
+        else:
+            candidate_links = [(d["link"], d.get("label","")) for d in GLOBAL_FALLBACK_PORTS]
+
+    # keep it snappy
+    return candidate_links[:3]
+
+def port_source(run: "ShipRun", port_tables: "PortTableCache"):
+    """Port-page rows, only when nothing delivered so far is within the last 18h."""
+    recent_iso = _most_recent_event_iso(run.items)
+    now_utc = datetime.utcnow().replace(tzinfo=timezone.utc)
+    if recent_iso and (now_utc - recent_iso) < timedelta(hours=18):
+        return
+    try:
+        candidate_links = _port_candidates(run)
+        if not candidate_links:
+            return
+        port_rows = _fetch_port_fallback_events(port_tables, run.name, candidate_links, imo=run.ship.get("imo"))
+        print(f"[info] Port fallback {run.name} using {len(candidate_links)} port(s): {len(port_rows)} rows")
+    except Exception as e:
+        print(f"[warn] Port fallback failed for {run.name}: {e}", file=sys.stderr)
+        return
+    for r in port_rows:
+        yield "port", r
 
-                # Write per-ship feeds (pretty + XSL PI)
-                try:
-                    ship_xml = build_rss(f"{name} - Arrivals & Departures", vf_url, ship_hist)
-                    ship_xml = _pretty_xml(ship_xml)
-                    _write_if_changed(os.path.join(DOCS_DIR, f"{slug}.xml"), ship_xml)
+def geo_source(run: "ShipRun", state: dict):
+    """Geofence events from the CruiseMapper fix (HTTP) and the ship's position track."""
+    cm_url = run.ship.get("cm_url") or f"https://www.cruisemapper.com/ships/{_cm_slug(run.name)}"
+    try:
+        coords = _cm_fetch_coords_http(cm_url)
+        if not coords:
+            print(f"[warn] No coords from CruiseMapper for {run.name} ({cm_url})")
+            return
+        track = PositionTrack(run.slug)
+        track.append(datetime.utcnow().replace(tzinfo=timezone.utc), coords)
+        events = geofence_events_from_coords(run.name, run.slug, coords, state, track=track)
+    except Exception as e:
+        print(f"[warn] Geofence failed for {run.name}: {e}", file=sys.stderr)
+        return
+    for ev in events:
+        yield "geo", ev
 
-                    latest_xml = build_rss(f"{name} - Latest Arrival/Departure", vf_url, ship_hist[:1])
-                    latest_xml = _pretty_xml(latest_xml)
-                    _write_if_changed(os.path.join(DOCS_DIR, f"{slug}-latest.xml"), latest_xml)
-                except Exception as e:
-                    print(f"[error] Writing ship feeds failed for {name}: {e}", file=sys.stderr)
-        finally:
-            pool.close()
+def ship_sources(run: "ShipRun", pool: "BrowserPool", port_tables: "PortTableCache", state: dict):
+    yield from vf_source(run, pool, state)
+    yield from port_source(run, port_tables)
+    yield from geo_source(run, state)
 
-    # ---- COMBINED HISTORY (sorted by event time) ----
-    all_hist = load_history("all")
-    all_hist = merge_items(all_hist, all_items_new, ALL_CAP)
-    save_history("all", all_hist)
+def normalize(run: "ShipRun", tagged):
+    """(kind, raw) -> ShipEvent; TBA/unparseable rows are dropped, build errors logged."""
+    for kind, raw in tagged:
+        try:
+            if kind == "vf":
+                ev = _event_from_vf_row(run.slug, run.name, raw, run.url)
+            elif kind == "port":
+                ev = _event_from_port_row(run.slug, run.name, raw)
+            else:
+                ev = raw
+        except Exception as e:
+            if kind == "vf":
+                run.failed.add(_vf_row_fingerprint(raw))
+            print(f"[warn] {kind} item build failed for {run.name}: {e}", file=sys.stderr)
+            continue
+        if ev is not None:
+            yield ev
 
-    try:
-        all_xml = build_rss("DCL Ships - Arrivals & Departures (All)", "https://github.com/", all_hist)
-        all_xml = _pretty_xml(all_xml)
-        _write_if_changed(os.path.join(DOCS_DIR, "all.xml"), all_xml)
-    except Exception as e:
-        print(f"[error] Writing all.xml failed: {e}", file=sys.stderr)
-
-    # ---- Latest one per ship (newest real event) ----
-    def _infer_slug_from_title(title: str) -> str:
-        for nm, sl in slug_by_name.items():
-            if title.startswith(nm):
-                return sl
-        cut = title.find(" Arrived")
-        if cut == -1:
-            cut = title.find(" Departed")
-        base = title[:cut] if cut != -1 else title
-        for nm, sl in slug_by_name.items():
-            if base.strip() == nm:
-                return sl
-        return base.strip()
-
-    all_hist_sorted = sorted(all_hist, key=_event_key, reverse=True)
-
-    latest_by_slug = {}
-    for it in all_hist_sorted:
-        if _is_tba(it):
+def dedupe(run: "ShipRun", events, canon_seen: dict):
+    """
+    Drop events whose canonical guid was already delivered (this run or earlier), and
+    near-duplicates: the same verb at the same port within NEAR_DUP_MINUTES of a known
+    entry. A near-duplicate from an equal or more authoritative source replaces that
+    entry (run.updates) instead of being alerted again.
+    """
+    index = run.index()
+    tolerance = NEAR_DUP_MINUTES * 60
+    for ev in events:
+        if canon_seen.get(ev.guid):
             continue
-        slug = it.get("shipSlug") or _infer_slug_from_title(it.get("title",""))
-        if not slug:
+        ts = ev.event_utc.timestamp()
+        key = EventIndex.key(ev.verb, ev.port, ev.link)
+        near = index.nearest(key, ts, tolerance)
+        if near is None:
+            index.add(key, ts, ev.guid, ev.source)
+            yield ev
             continue
-        if slug not in latest_by_slug:
-            latest_by_slug[slug] = it
-
-    latest_all = sorted(list(latest_by_slug.values()), key=_event_key, reverse=True)
-
+        at, guid, source = near
+        canon_seen[ev.guid] = True
+        if at != ts and SOURCE_AUTHORITY.get(ev.source, 0) >= SOURCE_AUTHORITY.get(source, 0):
+            index.remove(key, at, guid)
+            index.add(key, ts, guid, ev.source)
+            run.updates[guid] = ev
+            print(f"[info] {run.name} {ev.verb} {ev.port}: {ev.source} updates the {source} entry "
+                  f"({(ts - at) / 60:+.0f} min)")
+        else:
+            print(f"[debug] {run.name} {ev.verb} {ev.port}: {ev.source} near-duplicate of {source} entry, skipped")
+
+def deliver(run: "ShipRun", events, canon_seen: dict):
+    """Sink: feed item for the ship's history + email alert, marking each guid as seen."""
+    for ev in events:
+        item = ev.to_item(datetime.utcnow())
+        run.items.append(item)
+        canon_seen[ev.guid] = True
+        post_flow_webhook(ev.payload(item))
+
+def publish_ship(run: "ShipRun") -> list:
+    """Merge the run's items into the ship's history and write its feeds; returns the history."""
+    name, slug, vf_url, new = run.name, run.slug, run.url, run.items
+
+    # ---- PER SHIP HISTORY (sorted by event time) ----
+    ship_hist = run.history()
+    changed, replaced = list(new), []
+    if run.updates:
+        upd = lambda it: _updated_item(it, run.updates[it["guid"]]) if it.get("guid") in run.updates else it
+        replaced = [it for it in ship_hist if it.get("guid") in run.updates]
+        ship_hist, new = [upd(it) for it in ship_hist], [upd(it) for it in new]
+        changed = new + [upd(it) for it in replaced]
+    ship_hist = merge_items(ship_hist, new, PER_SHIP_CAP)
+    if changed:
+        save_history(slug, changed, replaced)
+
+    # DEBUG metrics
+    print(f"[debug] {name} new_items: ship_page={len([i for i in new if i.get('source')=='vf_ship'])} "
+          f"port_fallback={len([i for i in new if i.get('source')=='vf_port'])} "
+          f"geo={len([i for i in new if i.get('source')=='geo'])} "
+          f"total_added_this_run={len(new)} updated={len(run.updates)} "
+          f"hist_after_merge={len(ship_hist)}")
+
+    # Write per-ship feeds (pretty + XSL PI)
     try:
-        latest_all_xml = build_rss("DCL Ships - Latest (One per Ship)", "https://github.com/", latest_all)
-        latest_all_xml = _pretty_xml(latest_all_xml)
-        _write_if_changed(os.path.join(DOCS_DIR, "latest-all.xml"), latest_all_xml)
-        _write_if_changed(os.path.join(DOCS_DIR, "latest.xml"), latest_all_xml)
+        ship_xml, current = build_current_feed(slug, f"{name} - Arrivals & Departures", vf_url, ship_hist, [slug])
+        ship_xml = _pretty_xml(ship_xml)
+        _write_feed(os.path.join(DOCS_DIR, f"{slug}.xml"), ship_xml)
+        _write_feed(os.path.join(DOCS_DIR, f"{slug}.json"),
+                    build_json_snapshot(f"{name} - Arrivals & Departures", slug, current))
+
+        latest_xml = build_rss(f"{name} - Latest Arrival/Departure", vf_url, ship_hist[:1])
+        latest_xml = _pretty_xml(latest_xml)
+        _write_feed(os.path.join(DOCS_DIR, f"{slug}-latest.xml"), latest_xml)
+
+        _write_feed(os.path.join(RECENT_DIR, f"{slug}.json"),
+                    build_json_snapshot(f"{name} - Recent", slug, ship_hist[:RECENT_SHARD_ITEMS]))
     except Exception as e:
-        print(f"[error] Writing latest-all.xml failed: {e}", file=sys.stderr)
+        print(f"[error] Writing ship feeds failed for {name}: {e}", file=sys.stderr)
+    return ship_hist
+
+# ---------- Main ----------
+
+def parse_args(argv=None):
+    ap = argparse.ArgumentParser(description="Scrape ship movements and publish RSS/JSON feeds.")
+    ap.add_argument("--shard", type=parse_shard, metavar="I/N",
+                    help="Only scrape shard I of N (1-based); combined feeds are left to --merge")
+    ap.add_argument("--fleet", action="append", metavar="FLEET",
+                    help="Only scrape vessels of this fleet (repeatable); combined feeds are left to --merge")
+    ap.add_argument("--merge", action="store_true",
+                    help="Do not scrape: fold worker state into state.json and rebuild combined/fleet/index feeds")
+    return ap.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    os.makedirs(DOCS_DIR, exist_ok=True)
+
+    registry = ShipRegistry.load()
+    if not registry.ships:
+        print(f"[error] ships.json not found or empty at {SHIPS_PATH}", file=sys.stderr)
+        return  # nothing to do
 
-    save_json(STATE_PATH, state)
+    _ensure_stylesheet_dcl()
+
+    if args.merge:
+        state = load_run_state(STATE_PATH)
+        folded = fold_shard_states(state)
+        CombinedPublisher(registry).publish()
+        save_json(STATE_PATH, state)
+        for path in folded:
+            try:
+                os.remove(path)
+            except OSError as e:
+                print(f"[warn] Could not remove worker state {path}: {e}", file=sys.stderr)
+        print(f"[info] Merged {len(folded)} worker state file(s) and {len(registry.ships)} ship histories")
+        return
+
+    partial = bool(args.shard or args.fleet)
+    ships = registry.select(args.shard, args.fleet)
+    state_path = _run_state_path(args.shard, args.fleet)
+    if partial:
+        print(f"[info] Worker {os.path.basename(state_path)[:-5]}: {len(ships)} of {len(registry.ships)} vessels")
+
+    state = load_run_state(state_path)
+    canon_seen = state["canon_seen"]
+    HOSTS.load(state.get("hosts"))
+    VF_ENDPOINT.update(state.get("vf_endpoint") or {})
+    # "vf_selectors" was written while blocked->mobile retries learned under "desktop"
+    state.pop("vf_selectors", None)
+    VF_ROOT_SELECTORS.update(state.get("vf_root_selectors") or {})
+    latency = state.get("vf_latency")
+    VF_LATENCY.update(latency if isinstance(latency, dict) else {})   # pre-shard runs kept a flat list
+    combined = None if partial else CombinedPublisher(registry)
+
+    _start_parse_pool()
+    with sync_playwright() as p:
+        pool = BrowserPool(p)
+        port_tables = PortTableCache(pool)
+        try:
+            for s in ships:
+                run = ShipRun(s)
+                events = dedupe(run, normalize(run, ship_sources(run, pool, port_tables, state)), canon_seen)
+                deliver(run, events, canon_seen)
+                ship_hist = publish_ship(run)
+                if combined is not None:
+                    # combined feeds follow each ship that produced something new
+                    combined.update(run.slug, ship_hist, publish=bool(run.items or run.updates))
+        finally:
+            pool.close()
+            HTTP_POOL.close()
+            _close_parse_pool()
+            port_tables.report()
+            pool.report()
+            _ttd_report(state, pool.persistent)
+            print(f"[info] VF extraction ({VF_EXTRACT}): {VF_EXTRACT_STATS['direct']} direct, "
+                  f"{VF_EXTRACT_STATS['xhr']} captured XHR, {VF_EXTRACT_STATS['dom']} in-page, "
+                  f"{VF_EXTRACT_STATS['fallback']} BeautifulSoup fallback, {VF_EXTRACT_STATS['mismatch']} mismatches")
+            _root_report()
+            HOSTS.report()
+            state["hosts"] = HOSTS.dump()
+            if VF_ENDPOINT:
+                state["vf_endpoint"] = dict(VF_ENDPOINT)
+            state["vf_latency"] = {k: list(v) for k, v in VF_LATENCY.items()}
+            state["vf_root_selectors"] = dict(VF_ROOT_SELECTORS)
+
+    if partial:
+        os.makedirs(SHARD_STATE_DIR, exist_ok=True)
+        own = {s["slug"] for s in ships}
+        for key in SHARD_OWNED_KEYS:
+            if isinstance(state.get(key), dict):
+                state[key] = {slug: v for slug, v in state[key].items() if slug in own}
+        state["savedAt"] = datetime.utcnow().replace(microsecond=0).isoformat()
+    elif not combined.published:
+        combined.publish()
+    save_json(state_path, state)
 
 if __name__ == "__main__":
     try: